@@ -0,0 +1,265 @@
+# 评论分析核心逻辑：不依赖 Streamlit，界面与导出共用同一份聚合结果
+
+# 标准库导入
+import os
+import hashlib
+import time
+import logging
+import threading
+from pathlib import Path
+from collections import Counter
+
+# 第三方库导入
+import pandas as pd
+
+# 本地模块导入
+from phrases import new_phrase_sketches, add_phrases
+
+logger = logging.getLogger(__name__)
+
+# 可选的领域词典（jieba 用户词典格式：词 [词频] [词性]），可用环境变量覆盖路径
+USER_DICT_PATH = Path(os.environ.get(
+    'JIEBA_USER_DICT',
+    Path(__file__).parent / 'dicts' / 'user_dict.txt'
+))
+
+# 停用词列表
+STOP_WORDS = {
+    '的', '了', '和', '是', '就', '都', '而', '及', '与', '着',
+    '之', '用', '于', '把', '等', '去', '又', '能', '好', '在',
+    '或', '这', '那', '有', '很', '只', '些', '为', '呢', '啊',
+    '并', '给', '跟', '还', '个', '之类', '各种', '没有', '非常',
+    '可以', '因为', '因此', '所以', '但是', '但', '然后', '如果',
+    '虽然', '这样', '这些', '那些', '如此', '只是', '真的', '一个',
+}
+
+# 建议相关词汇
+SUGGESTION_WORDS = {
+    '议', '觉得', '希望', '调', '换', '改', '改进', '完善',
+    '优化', '提议', '期望', '最好', '应该', '不如', '要是',
+    '可以', '或许', '建议', '推荐', '提醒'
+}
+
+# 负面情绪词汇
+NEGATIVE_WORDS = {
+    '累', '无聊', '难受', '差', '糟糕', '失望', '不满', '不好',
+    '不行', '垃圾', '烦', '恶心', '坑', '不值', '贵', '慢',
+    '差劲', '敷衍', '态度差', '脏', '乱', '吵', '挤', '冷',
+    '热', '差评', '退款', '投诉', '举报', '骗', '坑'
+}
+
+# 差评阈值：评分不高于该值的评论计为差评（界面可调整）
+LOW_SCORE_THRESHOLD = 3
+
+# 分句标点：否定修饰与短语都不跨越分句
+CLAUSE_BREAKS = {'，', '。', '！', '？', '；', '、', ',', '.', '!', '?', ';', '~', '～', '\n'}
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+def get_tokenizer():
+    """返回进程内共享的 jieba 分词器，首次调用时加载词典"""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                import jieba
+                
+                started = time.perf_counter()
+                jieba.initialize()
+                if USER_DICT_PATH.exists():
+                    jieba.load_userdict(str(USER_DICT_PATH))
+                    logger.info(f"已加载领域词典: {USER_DICT_PATH}")
+                logger.info(f"jieba 词典加载耗时: {time.perf_counter() - started:.2f}s")
+                _tokenizer = jieba.dt
+    return _tokenizer
+
+def warm_up_tokenizer():
+    """预热分词器：加载词典并完成一次切分，供服务启动时调用"""
+    try:
+        list(get_tokenizer().cut('评论分析预热'))
+    except Exception as e:
+        logger.warning(f"jieba 预热失败: {str(e)}")
+
+def corpus_fingerprint(comments, *extra):
+    """根据评论内容及附加参数计算语料指纹，用作缓存键"""
+    hashed = pd.util.hash_pandas_object(pd.Series(comments), index=False)
+    digest = hashlib.sha1(hashed.to_numpy().tobytes())
+    for item in extra:
+        if isinstance(item, (set, frozenset)):
+            item = sorted(item)
+        digest.update(repr(item).encode('utf-8'))
+    return digest.hexdigest()
+
+def stop_words_version(user_stop_words):
+    """停用词集合的版本号：按内容计算，集合相同的会话共用同一版本"""
+    digest = hashlib.sha1('\x1f'.join(sorted(user_stop_words)).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def find_columns(df):
+    """查找路线列和评分列，返回 (route_col, score_col)"""
+    route_col = None
+    score_col = None
+    for col in df.columns:
+        if '路线名称' in str(col) or '产品名称' in str(col):
+            route_col = col
+        if '总安排打分' in str(col):
+            score_col = col
+    return route_col, score_col
+
+# 评价日期列的候选列名（按优先级）
+DATE_COLUMN_MARKERS = ('评价时间', '点评时间', '评论时间', '出游日期', '日期', '时间')
+
+def find_date_column(df, min_parse_rate=0.8):
+    """查找评价日期列：列名含日期关键字且抽样后大部分值能解析为日期"""
+    for marker in DATE_COLUMN_MARKERS:
+        for col in df.columns:
+            if marker not in str(col):
+                continue
+            sample = df[col].dropna().head(200)
+            if len(sample) and pd.to_datetime(sample, errors='coerce', format='mixed').notna().mean() >= min_parse_rate:
+                return col
+    return None
+
+# 分层抽样的评分段（差评段上界为默认差评阈值，中评段宽 1 分）
+SCORE_BANDS = ('差评', '中评', '好评')
+SCORE_BAND_EDGES = (float('-inf'), LOW_SCORE_THRESHOLD, LOW_SCORE_THRESHOLD + 1, float('inf'))
+
+def stratified_sample(df, score_col, size, random_state=0):
+    """按 数据来源 × 评分段 分层抽样，返回 (样本, 每条样本代表的评论数)
+
+    各层按规模等比例分配样本，每层至少抽 1 条，小来源、少见评分段也能出现在预览中。
+    """
+    bands = pd.cut(
+        pd.to_numeric(df[score_col], errors='coerce'),
+        list(SCORE_BAND_EDGES),
+        labels=SCORE_BANDS
+    ).astype(object).fillna('无评分')
+    keys = pd.DataFrame({'source': df['数据来源'].astype(str).to_numpy(), 'band': bands.to_numpy()}, index=df.index)
+    
+    shuffled = keys.sample(frac=1, random_state=random_state)
+    rank = shuffled.groupby(['source', 'band'], sort=False).cumcount().reindex(df.index)
+    sizes = keys.groupby(['source', 'band'], sort=False)['source'].transform('size')
+    quota = (sizes * size / len(df)).round().clip(lower=1)
+    keep = rank < quota
+    weights = sizes[keep] / quota.clip(upper=sizes)[keep]
+    return df[keep].reset_index(drop=True), weights.to_numpy()
+
+# 评论类型筛选项
+COMMENT_TYPES = ("全部评论", "建议评论", "负面评论")
+
+def filter_mask(comments, sentiment_scores, keyword='', comment_types=("全部评论",)):
+    """按关键词与评论类型筛选评论，返回布尔 Series"""
+    comments = pd.Series(comments)
+    mask = pd.Series(True, index=comments.index)
+    
+    if keyword:
+        mask = mask & comments.str.contains(keyword, na=False)
+    
+    if "全部评论" not in comment_types:
+        if "建议评论" in comment_types:
+            mask = mask & comments.str.contains('|'.join(SUGGESTION_WORDS), na=False)
+        if "负面评论" in comment_types:
+            # 按情感得分判断，"不差"之类的否定表达不再算作负面
+            mask = mask & (pd.Series(sentiment_scores, index=comments.index) < 0)
+    return mask
+
+def is_valid_word(word, user_stop_words=()):
+    """判断分词结果是否参与统计"""
+    return (len(word) > 1 and
+            word not in STOP_WORDS and
+            word not in user_stop_words and
+            not word.isdigit())
+
+def tokenize_comments(comments):
+    """逐条分词，返回与输入等长的词列表（保留标点，供情感分句使用）"""
+    tokenizer = get_tokenizer()
+    seen = {}
+    token_lists = []
+    for comment in comments:
+        if pd.isna(comment):
+            token_lists.append([])
+            continue
+        comment = str(comment).strip()
+        tokens = seen.get(comment)
+        if tokens is None:
+            tokens = [word.strip() for word in tokenizer.cut(comment) if word.strip()]
+            seen[comment] = tokens
+        token_lists.append(tokens)
+    return token_lists
+
+def build_aggregates(comments, sources, scores, token_lists, user_stop_words=(), low_score_threshold=LOW_SCORE_THRESHOLD):
+    """一次遍历评论，生成四个视角的词频、关联评论以及按来源的词频"""
+    word_freq = Counter()
+    word_freq_low = Counter()
+    word_comments = {}
+    word_comments_low = {}
+    suggestion_freq = Counter()
+    negative_freq = Counter()
+    suggestion_comments = {}
+    negative_comments = {}
+    source_word_freq = {}
+    # 相同的分句先合并计数，每个不同分句只切分、计入草图一次（短语至少两个词，单词分句不计）
+    clause_counts = Counter()
+
+    for comment, source, score, tokens in zip(comments, sources, scores, token_lists):
+        if pd.isna(comment) or pd.isna(score):
+            continue
+
+        comment = str(comment).strip()
+        if not comment:
+            continue
+
+        source_freq = source_word_freq.setdefault(source, Counter())
+        clause_words = []
+
+        for word in tokens:
+            # 短语统计：分句内的有效词序列
+            if word in CLAUSE_BREAKS:
+                if len(clause_words) > 1:
+                    clause_counts[tuple(clause_words)] += 1
+                clause_words = []
+                continue
+            if not is_valid_word(word, user_stop_words):
+                continue
+            clause_words.append(word)
+
+            # 总体词频统计
+            word_freq[word] += 1
+            source_freq[word] += 1
+            word_comments.setdefault(word, set()).add((comment, source))
+
+            # 差评词频统计
+            if score <= low_score_threshold:
+                word_freq_low[word] += 1
+                word_comments_low.setdefault(word, set()).add((comment, source))
+
+            # 建议词统计
+            if word in SUGGESTION_WORDS:
+                suggestion_freq[word] += 1
+                suggestion_comments.setdefault(word, set()).add((comment, source))
+
+            # 负面词统计
+            if word in NEGATIVE_WORDS:
+                negative_freq[word] += 1
+                negative_comments.setdefault(word, set()).add((comment, source))
+
+        if len(clause_words) > 1:
+            clause_counts[tuple(clause_words)] += 1
+
+    phrase_sketches = new_phrase_sketches()
+    for clause, count in clause_counts.items():
+        add_phrases(phrase_sketches, clause, count)
+
+    return {
+        'word_freq': word_freq,
+        'word_freq_low': word_freq_low,
+        'word_comments': word_comments,
+        'word_comments_low': word_comments_low,
+        'suggestion_freq': suggestion_freq,
+        'negative_freq': negative_freq,
+        'suggestion_comments': suggestion_comments,
+        'negative_comments': negative_comments,
+        'source_word_freq': source_word_freq,
+        'phrase_sketches': phrase_sketches,
+    }
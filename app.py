@@ -1,20 +1,46 @@
 # 标准库导入
+import io
+import re
+import hashlib
+import math
 import sys
+import time
 import logging
 import html
+import threading
 from pathlib import Path
-from collections import Counter
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # 第三方库导入
 import streamlit as st
 import pandas as pd
-import numpy as np
-import plotly.express as px
-import jieba
-from wordcloud import WordCloud
-import requests
 import shutil
 
+# 本地模块导入
+from analysis import (
+    LOW_SCORE_THRESHOLD, COMMENT_TYPES,
+    find_columns, find_date_column, filter_mask, corpus_fingerprint, stratified_sample, stop_words_version,
+    tokenize_comments, build_aggregates, warm_up_tokenizer,
+)
+from sentiment import score_comments, label_scores, SENTIMENT_LABELS
+from vectors import (
+    build_term_matrix, distinctive_terms, score_impact,
+    build_cooccurrence, partner_terms, partner_edges,
+)
+from topics import cluster_topics
+from trends import TREND_FREQS, parse_dates, build_trends, term_shares
+from cache import cache_manager, memoize
+from export import new_export_path, iter_export_tables, write_xlsx, write_csv_zip
+from ingest import SUPPORTED_TYPES, read_table
+from archive import (
+    ARCHIVE_PATH, archive_exists, archive_comments, archive_stats, archive_version, archive_sources,
+    load_corpus, top_terms, search_comments, count_matches,
+)
+
+# 本次运行的起始时间，用于统计首次渲染耗时
+RUN_STARTED_AT = time.perf_counter()
+
 # 页面配置（必须是第一个 Streamlit 命令）
 st.set_page_config(
     page_title="Excel评论分析工具",
@@ -26,423 +52,37 @@ st.set_page_config(
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 停用词列表
-STOP_WORDS = {
-    '的', '了', '和', '是', '就', '都', '而', '及', '与', '着',
-    '之', '用', '于', '把', '等', '去', '又', '能', '好', '在',
-    '或', '这', '那', '有', '很', '只', '些', '为', '呢', '啊',
-    '并', '给', '跟', '还', '个', '之类', '各种', '没有', '非常',
-    '可以', '因为', '因此', '所以', '但是', '但', '然后', '如果',
-    '虽然', '这样', '这些', '那些', '如此', '只是', '真的', '一个',
-}
-
 # 用户自定义停用词
 USER_STOP_WORDS = set()
 
-# 建议相关词汇
-SUGGESTION_WORDS = {
-    '议', '觉得', '希望', '调', '换', '改', '改进', '完善',
-    '优化', '提议', '期望', '最好', '应该', '不如', '要是',
-    '可以', '或许', '建议', '推荐', '提醒'
-}
-
-# 负面情绪词汇
-NEGATIVE_WORDS = {
-    '累', '无聊', '难受', '差', '糟糕', '失望', '不满', '不好',
-    '不行', '垃圾', '烦', '恶心', '坑', '不值', '贵', '慢',
-    '差劲', '敷衍', '态度差', '脏', '乱', '吵', '挤', '冷',
-    '热', '差评', '退款', '投诉', '举报', '骗', '坑'
-}
-
 # 在文件开头添加版本常量
 VERSION = "2.0.0"  # 更新版本号
 CHART_COLORS = ['#153f36', '#d88b2d', '#337b87', '#c8503e', '#547a44', '#8a6f3a']
+WORDCLOUD_MAX_WORDS = 200
+
+# 渐进式预览：评论数超过阈值且完整结果尚未就绪时，先展示分层抽样的预估结果
+PREVIEW_MIN_ROWS = 30000
+PREVIEW_SAMPLE_SIZE = 3000
+PREVIEW_POLL_SECONDS = 1.0
+MAX_TRACKED_JOBS = 16
 
 # 在文件开头，USER_STOP_WORDS 定义后添加
 if 'user_stop_words' not in st.session_state:
     st.session_state.user_stop_words = set()
 
-# 在文件开头添加自定义样式
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Fraunces:opsz,wght@9..144,650;9..144,800&family=Noto+Sans+SC:wght@400;500;700;900&display=swap');
-
-    :root {
-        --ink: #17201b;
-        --muted: #68756f;
-        --paper: #fbf7ed;
-        --panel: rgba(255, 252, 244, 0.92);
-        --panel-strong: #fffdf6;
-        --line: rgba(39, 52, 44, 0.14);
-        --pine: #153f36;
-        --moss: #547a44;
-        --amber: #d88b2d;
-        --coral: #c8503e;
-        --sky: #337b87;
-        --shadow: 0 18px 50px rgba(23, 32, 27, 0.10);
-        --soft-shadow: 0 8px 24px rgba(23, 32, 27, 0.07);
-        --radius: 8px;
-    }
-
-    html, body, [data-testid="stAppViewContainer"] {
-        color: var(--ink);
-        font-family: 'Noto Sans SC', sans-serif !important;
-        background:
-            radial-gradient(circle at 12% 10%, rgba(216, 139, 45, 0.16), transparent 30%),
-            radial-gradient(circle at 88% 6%, rgba(51, 123, 135, 0.13), transparent 28%),
-            linear-gradient(135deg, #fbf7ed 0%, #f3ead9 48%, #edf3ea 100%) !important;
-    }
-
-    .stApp::before {
-        content: "";
-        position: fixed;
-        inset: 0;
-        pointer-events: none;
-        z-index: 0;
-        opacity: 0.22;
-        background-image:
-            linear-gradient(rgba(23, 32, 27, 0.06) 1px, transparent 1px),
-            linear-gradient(90deg, rgba(23, 32, 27, 0.06) 1px, transparent 1px);
-        background-size: 34px 34px;
-        mask-image: linear-gradient(to bottom, black, transparent 75%);
-    }
-
-    .main .block-container {
-        max-width: 1320px;
-        padding: 2rem 2rem 4rem;
-        position: relative;
-        z-index: 1;
-    }
-
-    h1, h2, h3 {
-        letter-spacing: 0 !important;
-    }
-
-    .stTextInput input,
-    .stTextArea textarea,
-    .stSelectbox select {
-        border: 1px solid var(--line) !important;
-        border-radius: var(--radius) !important;
-        padding: 0.75rem 0.9rem !important;
-        background-color: rgba(255, 253, 246, 0.98) !important;
-        color: var(--ink) !important;
-        font-size: 0.94rem !important;
-        box-shadow: inset 0 1px 0 rgba(255, 255, 255, 0.55) !important;
-    }
-
-    .stTextInput input:focus,
-    .stTextArea textarea:focus {
-        border-color: var(--amber) !important;
-        box-shadow: 0 0 0 3px rgba(216, 139, 45, 0.16) !important;
-    }
-
-    .stMultiSelect [data-baseweb="select"] > div {
-        background-color: rgba(255, 253, 246, 0.98) !important;
-        border: 1px solid var(--line) !important;
-        border-radius: var(--radius) !important;
-        min-height: 46px !important;
-    }
-
-    .stSelectbox label,
-    .stMultiSelect label,
-    .stTextInput label,
-    .stTextArea label {
-        color: var(--pine) !important;
-        font-weight: 700 !important;
-        font-size: 0.9rem !important;
-    }
-
-    .stButton button {
-        background: var(--pine) !important;
-        color: #fffdf6 !important;
-        border: 1px solid rgba(255, 255, 255, 0.18) !important;
-        padding: 0.62rem 1.1rem !important;
-        border-radius: var(--radius) !important;
-        font-weight: 800 !important;
-        box-shadow: var(--soft-shadow) !important;
-        transition: transform 160ms ease, box-shadow 160ms ease, background 160ms ease !important;
-    }
-
-    .stButton button:hover {
-        background: #1d5448 !important;
-        transform: translateY(-1px);
-        box-shadow: 0 12px 28px rgba(21, 63, 54, 0.18) !important;
-    }
-
-    [data-testid="stMetric"] {
-        background: var(--panel-strong);
-        border: 1px solid var(--line);
-        border-radius: var(--radius);
-        padding: 1rem 1.1rem;
-        box-shadow: var(--soft-shadow);
-    }
-
-    [data-testid="stMetricLabel"] {
-        color: var(--muted);
-        font-size: 0.78rem;
-        font-weight: 700;
-    }
-
-    [data-testid="stMetricValue"] {
-        color: var(--pine);
-        font-family: 'Fraunces', 'Noto Sans SC', serif;
-        font-size: 2rem;
-        font-weight: 800;
-    }
-
-    [data-testid="stFileUploader"] {
-        background: var(--panel);
-        border: 1px dashed rgba(21, 63, 54, 0.34);
-        border-radius: var(--radius);
-        padding: 1rem;
-        box-shadow: var(--soft-shadow);
-    }
-
-    .streamlit-expanderHeader {
-        background: rgba(255, 253, 246, 0.9) !important;
-        border: 1px solid var(--line) !important;
-        border-radius: var(--radius) !important;
-        color: var(--pine) !important;
-        font-weight: 800 !important;
-    }
-
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 0.5rem !important;
-        padding: 0.4rem !important;
-        background: rgba(21, 63, 54, 0.08) !important;
-        border: 1px solid rgba(21, 63, 54, 0.12) !important;
-        border-radius: var(--radius) !important;
-        margin-bottom: 1.25rem !important;
-    }
-
-    .stTabs [data-baseweb="tab"] {
-        height: 44px !important;
-        padding: 0 1rem !important;
-        border-radius: 6px !important;
-        color: var(--pine) !important;
-        font-weight: 800 !important;
-        background: transparent !important;
-    }
-
-    .stTabs [aria-selected="true"] {
-        background: var(--panel-strong) !important;
-        color: var(--coral) !important;
-        box-shadow: 0 6px 18px rgba(23, 32, 27, 0.08) !important;
-    }
-
-    .workspace-hero {
-        position: relative;
-        overflow: hidden;
-        border-radius: var(--radius);
-        padding: 2.1rem;
-        margin-bottom: 1.25rem;
-        color: #fffdf6;
-        background:
-            linear-gradient(120deg, rgba(21, 63, 54, 0.96), rgba(38, 82, 62, 0.92)),
-            repeating-linear-gradient(135deg, transparent 0, transparent 16px, rgba(255,255,255,0.06) 16px, rgba(255,255,255,0.06) 17px);
-        box-shadow: var(--shadow);
-    }
-
-    .workspace-hero::after {
-        content: "";
-        position: absolute;
-        right: -8rem;
-        top: -8rem;
-        width: 22rem;
-        height: 22rem;
-        border: 1px solid rgba(255, 253, 246, 0.22);
-        transform: rotate(18deg);
-    }
-
-    .hero-kicker {
-        color: rgba(255, 253, 246, 0.76);
-        font-size: 0.82rem;
-        font-weight: 800;
-        letter-spacing: 0.08em;
-        text-transform: uppercase;
-        margin-bottom: 0.55rem;
-    }
-
-    .hero-title {
-        font-family: 'Fraunces', 'Noto Sans SC', serif;
-        font-size: clamp(2.2rem, 5vw, 4.7rem);
-        line-height: 0.95;
-        font-weight: 800;
-        margin: 0;
-        max-width: 760px;
-    }
-
-    .hero-copy {
-        max-width: 680px;
-        margin: 1rem 0 0;
-        color: rgba(255, 253, 246, 0.82);
-        font-size: 1rem;
-        line-height: 1.7;
-    }
-
-    .hero-meta {
-        display: flex;
-        gap: 0.65rem;
-        flex-wrap: wrap;
-        margin-top: 1.4rem;
-    }
-
-    .hero-pill {
-        border: 1px solid rgba(255, 253, 246, 0.22);
-        background: rgba(255, 253, 246, 0.10);
-        border-radius: 999px;
-        padding: 0.45rem 0.75rem;
-        font-size: 0.82rem;
-        font-weight: 800;
-    }
-
-    .steps-grid {
-        display: grid;
-        grid-template-columns: repeat(3, minmax(0, 1fr));
-        gap: 0.85rem;
-        margin-bottom: 1.25rem;
-    }
-
-    .step-card,
-    .notice-card,
-    .control-card,
-    .comment-card {
-        background: var(--panel);
-        border: 1px solid var(--line);
-        border-radius: var(--radius);
-        box-shadow: var(--soft-shadow);
-    }
+# 样式表路径
+STYLE_PATH = Path(__file__).parent / 'assets' / 'app.css'
 
-    .step-card {
-        padding: 1rem;
-        border-top: 4px solid var(--amber);
-    }
+@memoize('assets', ttl=0)
+def load_stylesheet(path, mtime):
+    """读取样式表并去掉注释与多余空白（mtime 参与缓存键，文件修改后自动失效）"""
+    css = Path(path).read_text(encoding='utf-8')
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    return re.sub(r'\s*([{};])\s*', r'\1', css).strip()
 
-    .step-card strong {
-        display: block;
-        color: var(--pine);
-        margin-bottom: 0.28rem;
-        font-size: 0.98rem;
-    }
-
-    .step-card span {
-        color: var(--muted);
-        font-size: 0.88rem;
-        line-height: 1.55;
-    }
-
-    .notice-card {
-        padding: 1.1rem 1.2rem;
-        margin-bottom: 1.25rem;
-        border-left: 5px solid var(--sky);
-    }
-
-    .notice-card h4 {
-        margin: 0 0 0.35rem;
-        color: var(--pine);
-        font-size: 1.02rem;
-    }
-
-    .notice-card p {
-        color: var(--muted);
-        margin: 0;
-        line-height: 1.65;
-        font-size: 0.92rem;
-    }
-
-    .designer-mark {
-        color: var(--muted);
-        text-align: right;
-        font-size: 0.82rem;
-        font-weight: 700;
-        margin: 0.5rem 0 1.1rem;
-    }
-
-    .filter-box {
-        background: rgba(255, 253, 246, 0.94);
-        border: 1px solid var(--line);
-        border-radius: var(--radius);
-        box-shadow: var(--soft-shadow);
-        padding: 1rem;
-        margin: 1rem 0 1.25rem;
-    }
-
-    .filter-title {
-        color: var(--pine);
-        font-weight: 900;
-        margin-bottom: 0.75rem;
-        padding-bottom: 0.65rem;
-        border-bottom: 1px solid var(--line);
-    }
-
-    .filter-item,
-    .control-card {
-        padding: 1rem;
-    }
-
-    .file-summary {
-        background: rgba(84, 122, 68, 0.08);
-        border: 1px solid rgba(84, 122, 68, 0.16);
-        border-radius: var(--radius);
-        padding: 0.85rem;
-        margin-bottom: 1rem;
-        color: var(--pine);
-        line-height: 1.55;
-    }
-
-    .comment-card {
-        padding: 1rem;
-        margin-bottom: 0.85rem;
-        min-height: 120px;
-        display: flex;
-        flex-direction: column;
-        justify-content: space-between;
-        transition: transform 160ms ease, box-shadow 160ms ease;
-    }
-
-    .comment-card:hover {
-        transform: translateY(-2px);
-        box-shadow: var(--shadow);
-    }
-
-    .comment-text {
-        color: var(--ink);
-        line-height: 1.7;
-        font-size: 0.94rem;
-    }
-
-    .comment-source {
-        margin-top: 0.75rem;
-        color: var(--muted);
-        font-size: 0.78rem;
-        text-align: right;
-        font-weight: 700;
-    }
-
-    .highlight {
-        color: var(--coral);
-        background: rgba(216, 139, 45, 0.16);
-        border: 1px solid rgba(216, 139, 45, 0.22);
-        border-radius: 4px;
-        padding: 0 0.2rem;
-        font-weight: 900;
-    }
-
-    @media (max-width: 820px) {
-        .main .block-container {
-            padding: 1rem 0.8rem 3rem;
-        }
-
-        .workspace-hero {
-            padding: 1.35rem;
-        }
-
-        .steps-grid {
-            grid-template-columns: 1fr;
-        }
-    }
-</style>
-""", unsafe_allow_html=True)
+# 自定义样式：从样式表文件读取，每个进程只读取、压缩一次
+st.markdown(f"<style>{load_stylesheet(str(STYLE_PATH), STYLE_PATH.stat().st_mtime)}</style>", unsafe_allow_html=True)
 
 # 工具函数
 def ensure_font():
@@ -472,6 +112,8 @@ def ensure_font():
     
     # 从网络下载字体
     try:
+        import requests
+        
         font_url = "https://cdn.jsdelivr.net/gh/googlefonts/noto-cjk@main/Sans/OTF/SimplifiedChinese/NotoSansCJKsc-Regular.otf"
         response = requests.get(font_url)
         response.raise_for_status()
@@ -527,6 +169,86 @@ def style_bar_chart(fig, color='#153f36'):
     fig.update_xaxes(showgrid=False)
     return fig
 
+def build_source_pie(px, source_counts):
+    """数据来源分布环形图"""
+    fig_source = px.pie(
+        values=source_counts.values,
+        names=source_counts.index,
+        height=300,  # 固定高度
+        width=None,  # 自动应宽度
+    )
+    # 调整饼图布局
+    fig_source.update_layout(
+        margin=dict(l=20, r=20, t=20, b=20),  # 减小边距
+        showlegend=True,  # 显示图例
+        legend=dict(
+            orientation="h",  # 水平图例
+            yanchor="bottom",
+            y=1.02,  # 图例位置
+            xanchor="right",
+            x=1
+        ),
+        # 调整饼图大小
+        autosize=True,  # 自动调整���小
+        height=300,  # 固定高度
+    )
+    # 调整饼图样式
+    fig_source.update_traces(
+        textposition='inside',  # 文字位置
+        textinfo='percent+label',  # 显示百分比和标签
+        hole=0.3,  # 添加环形效果
+        pull=[0.05] * len(source_counts),  # 轻微分离扇形
+        marker=dict(
+            colors=CHART_COLORS,
+            line=dict(color='white', width=2)  # 添加白色边框
+        )
+    )
+    return fig_source
+
+def build_top_words_bar(px, top_words):
+    """总体词频柱状图"""
+    fig = px.bar(
+        x=list(top_words.keys()),
+        y=list(top_words.values()),
+        labels={'x': '关键词', 'y': '出现次数'},
+        height=400  # 固定高度
+    )
+    fig.update_layout(
+        margin=dict(l=20, r=20, t=20, b=80),  # 增加底部边距，为倾斜的标签��出空间
+        xaxis_tickangle=-45,  # 标签倾斜角度
+        xaxis=dict(
+            tickmode='array',
+            ticktext=list(top_words.keys()),
+            tickvals=list(range(len(top_words))),
+            tickfont=dict(size=11)  # 调整字体大小
+        ),
+        yaxis=dict(
+            title=dict(
+                text='出现次数',
+                font=dict(size=12)
+            ),
+            tickfont=dict(size=11)
+        ),
+        bargap=0.2,  # 调整柱子之间的间距
+        plot_bgcolor='white',  # 设置背景色为白色
+        showlegend=False
+    )
+    return style_bar_chart(fig, CHART_COLORS[0])
+
+def build_keyword_bar(px, top_words, x_label, color):
+    """各分析视角的关键词柱状图"""
+    fig = px.bar(
+        x=list(top_words.keys()),
+        y=list(top_words.values()),
+        labels={'x': x_label, 'y': '出现次数'},
+        height=300  # 固定高度
+    )
+    fig.update_layout(
+        margin=dict(l=20, r=20, t=20, b=20),
+        xaxis_tickangle=-45
+    )
+    return style_bar_chart(fig, color)
+
 def get_most_complete_comment(comments):
     """从相似评论中选择最完整的一条"""
     normalized_comments = {}
@@ -539,7 +261,589 @@ def get_most_complete_comment(comments):
             normalized_comments[normalized] = comment
     return list(normalized_comments.values())
 
+@memoize('frames')
+def load_table(data, name):
+    """按文件内容缓存解析后的表格（xlsx / csv / parquet，自动识别表头行）"""
+    df = read_table(data, name)
+    df['数据来源'] = name
+    return df
+
+@memoize('analysis_results')
+def get_analysis_results(file_digests, filter_keyword, comment_types, stop_words_version, low_score_threshold,
+                         sampled, _df, _score_col, _date_col, _corpus_tokens, _user_stop_words):
+    """按完整筛选状态缓存一次分析的全部结果，切换回算过的筛选组合时直接返回
+
+    缓存键只含文件摘要、关键词、评论类型、停用词版本、差评阈值和是否抽样，
+    命中时不再对评论内容做哈希；未命中时分词、词矩阵等仍复用按内容缓存的中间结果。
+    """
+    token_lists = get_tokens(_df.iloc[:, 0], _corpus_tokens)
+    df = _df.assign(情感得分=get_sentiment_scores(_df.iloc[:, 0], token_lists))
+    
+    # 应用筛选条件
+    mask = filter_mask(df.iloc[:, 0], df['情感得分'], filter_keyword, comment_types)
+    positions = mask.to_numpy().nonzero()[0]
+    filtered_df = df[mask]
+    term_matrix, term_vocab = get_term_matrix(df.iloc[:, 0], _user_stop_words, token_lists)
+    filtered_matrix = term_matrix[positions]
+    comments = filtered_df.iloc[:, 0]
+    scores = filtered_df[_score_col]
+    
+    return {
+        'filtered_df': filtered_df,
+        'positions': positions,
+        'filtered_matrix': filtered_matrix,
+        'term_vocab': term_vocab,
+        # 词频统计一次遍历完成，导出直接复用
+        'aggregates': build_aggregates(
+            comments, filtered_df['数据来源'], scores,
+            [token_lists[i] for i in positions], _user_stop_words, low_score_threshold
+        ),
+        # 共现矩阵在四个视角的关键词详情中共用
+        'cooccurrence': build_cooccurrence(filtered_matrix, term_vocab),
+        'total': len(comments),
+        'low_score': int((scores <= low_score_threshold).sum()),
+        'negative': int((filtered_df['情感得分'] < 0).sum()),
+        # 下游缓存（来源对比、主题、评分影响、时间趋势）按筛选结果的内容指纹共用，
+        # 评分、情感得分和日期也计入指纹，文本相同而评分或日期更正过的文件不会命中旧结果
+        'fingerprint': corpus_fingerprint(
+            pd.concat([
+                comments, filtered_df['数据来源'], scores.astype(str), filtered_df['情感得分'].astype(str),
+                (filtered_df[_date_col] if _date_col is not None else pd.Series(dtype=object)).astype(str)
+            ], ignore_index=True),
+            _user_stop_words, low_score_threshold, _date_col
+        ),
+    }
+
+@memoize('tokens')
+def get_tokens(comments, _token_lists=None):
+    """缓存全部评论的分词结果，筛选后按位置取子集（评论库语料直接使用入库时保存的分词）"""
+    return tokenize_comments(comments) if _token_lists is None else _token_lists
+
+@memoize('term_matrix')
+def get_term_matrix(comments, user_stop_words, _token_lists):
+    """缓存全部评论的稀疏文档-词矩阵，筛选后按行切片"""
+    return build_term_matrix(_token_lists, user_stop_words)
+
+@memoize('distinctive_terms')
+def get_distinctive_terms(fingerprint, _sources, _matrix, _vocab):
+    """按筛选结果指纹缓存各来源的区分度词表"""
+    return distinctive_terms(_matrix, _vocab, _sources.to_numpy(), top_n=30)
+
+@memoize('score_impact')
+def get_score_impact(fingerprint, min_count, low_score_threshold, _scores, _matrix, _vocab):
+    """按筛选结果指纹缓存各词的评分影响排名"""
+    return score_impact(_matrix, _vocab, _scores, min_count=min_count, low_score_threshold=low_score_threshold)
+
+@memoize('topics')
+def get_topics(fingerprint, n_topics, low_score_threshold, _matrix, _vocab, _comments, _scores):
+    """按筛选结果指纹与主题数缓存聚类结果"""
+    return cluster_topics(_matrix, _vocab, _comments, _scores, n_topics=n_topics, low_score_threshold=low_score_threshold)
+
+@memoize('trends')
+def get_trends(fingerprint, freq, low_score_threshold, date_col, _dates, _scores, _sentiment_scores, _matrix, _vocab):
+    """按筛选结果指纹与周期粒度缓存时间趋势"""
+    return build_trends(_matrix, _vocab, parse_dates(_dates), _scores, _sentiment_scores,
+                        freq=freq, low_score_threshold=low_score_threshold)
+
+@memoize('sentiment_scores')
+def get_sentiment_scores(comments, _token_lists):
+    """缓存每条评论的情感得分"""
+    return score_comments(_token_lists)
+
+@memoize('archive_corpus', ttl=0)
+def get_archive_corpus(version, sources):
+    """读取评论库中所选来源的评论与分词（version 参与缓存键，有新增评论时重新读取）"""
+    return load_corpus(sources)
+
+@memoize('archived', ttl=0)
+def archive_frame(fingerprint, archive_path, _df, _token_lists, route_col, score_col, date_col):
+    """把当前评论写入本地评论库，同一批评论每个进程只写一次（重复行由内容哈希去重）"""
+    return archive_comments(_df, _token_lists, route_col, score_col, date_col, path=archive_path)
+
+EXPORT_FORMATS = {
+    "Excel (.xlsx)": ('.xlsx', write_xlsx,
+                      'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    "CSV (.zip)": ('.zip', write_csv_zip, 'application/zip'),
+}
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up():
+    """进程级预热：服务启动后的首次运行即在后台线程加载 jieba 词典"""
+    thread = threading.Thread(target=warm_up_tokenizer, name='jieba-warm-up', daemon=True)
+    thread.start()
+    return {'started_at': time.perf_counter(), 'first_render': None}
+
+@st.cache_resource(show_spinner=False)
+def get_background_jobs():
+    """进程级后台线程池与任务表：大文件的完整计算在这里运行，不阻塞页面渲染"""
+    return {
+        'executor': ThreadPoolExecutor(max_workers=2, thread_name_prefix='full-analysis'),
+        'jobs': OrderedDict(),
+        'lock': threading.Lock(),
+    }
+
+def run_full_analysis(comments, user_stop_words, corpus_tokens=None):
+    """完整计算全部评论的分词、情感得分与词矩阵（结果写入共享缓存，页面重跑时直接命中）"""
+    token_lists = get_tokens(comments, corpus_tokens)
+    get_sentiment_scores(comments, token_lists)
+    get_term_matrix(comments, user_stop_words, token_lists)
+
+def full_analysis_job(file_digests, comments, user_stop_words, corpus_tokens=None):
+    """返回该语料的后台完整计算任务，尚未提交时提交一个（多个会话共用同一任务）
+
+    任务按文件摘要与停用词版本区分，页面重跑时无需重新哈希评论内容；
+    修改停用词后重新提交，新的词矩阵同样在后台计算。
+    """
+    state = get_background_jobs()
+    key = (tuple(file_digests), stop_words_version(user_stop_words))
+    with state['lock']:
+        job = state['jobs'].get(key)
+        if job is None:
+            job = state['executor'].submit(run_full_analysis, comments, user_stop_words, corpus_tokens)
+            state['jobs'][key] = job
+            while len(state['jobs']) > MAX_TRACKED_JOBS:
+                state['jobs'].popitem(last=False)
+    return job
+
+@st.fragment(run_every=PREVIEW_POLL_SECONDS)
+def watch_full_analysis(job):
+    """定时检查后台任务，完成后整页重跑，用完整结果替换抽样预估"""
+    if job.done():
+        st.rerun()
+
+def log_first_render(warm_up_state):
+    """记录每个会话（以及本进程）首次渲染完成的耗时"""
+    if st.session_state.get('first_render_logged'):
+        return
+    st.session_state.first_render_logged = True
+    elapsed = time.perf_counter() - RUN_STARTED_AT
+    logger.info(f"会话首次渲染耗时: {elapsed:.2f}s")
+    if warm_up_state['first_render'] is None:
+        warm_up_state['first_render'] = time.perf_counter() - warm_up_state['started_at']
+        logger.info(f"进程首次渲染耗时（自预热开始）: {warm_up_state['first_render']:.2f}s")
+
+@memoize('wordcloud_images')
+def get_wordcloud_image(frequencies, width=400, height=300):
+    """生成词云并编码为显示尺寸的调色板 PNG（wordcloud 在首次使用时才导入）"""
+    from wordcloud import WordCloud
+    
+    wc = WordCloud(
+        font_path=ensure_font(),
+        width=width,
+        height=height,
+        background_color='white',
+        max_words=WORDCLOUD_MAX_WORDS
+    )
+    wc.generate_from_frequencies(dict(frequencies))
+    buffer = io.BytesIO()
+    wc.to_image().quantize(colors=256).save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+@memoize('figures')
+def get_figure(chart_key, _build):
+    """按图表数据缓存 Plotly 图表：数据不变时不重建，序列化结果逐字节一致"""
+    return _build()
+
 # UI组件函数
+def render_wordcloud(frequencies):
+    """显示词云图（图片按词频缓存，直接发送已编码的 PNG 字节）"""
+    image = get_wordcloud_image(tuple(frequencies.most_common(WORDCLOUD_MAX_WORDS)))
+    st.image(image, output_format='PNG')
+
+def render_phrase_chart(phrase_sketches, px):
+    """展示 Space-Saving 草图中的高频二元/三元短语"""
+    st.subheader("🔗 高频短语")
+    phrase_size = st.radio(
+        "短语长度",
+        options=list(phrase_sketches),
+        format_func=lambda size: f"{size} 词短语",
+        horizontal=True,
+        key="phrase_size"
+    )
+    top_phrases = phrase_sketches[phrase_size].top(20)
+    if not top_phrases:
+        st.info("没有找到可统计的短语")
+        return
+    def build():
+        fig = px.bar(
+            x=[phrase for phrase, _, _ in top_phrases],
+            y=[count for _, count, _ in top_phrases],
+            error_y_minus=[error for _, _, error in top_phrases],
+            error_y=[0] * len(top_phrases),
+            labels={'x': '短语', 'y': '出现次数'},
+            height=320
+        )
+        fig.update_layout(
+            margin=dict(l=20, r=20, t=20, b=80),
+            xaxis_tickangle=-45
+        )
+        return style_bar_chart(fig, CHART_COLORS[2])
+    
+    fig = get_figure(('phrases', top_phrases), build)
+    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+    st.caption("短语频次为固定内存草图的估计值，误差线表示可能的高估上限。")
+
+def render_sentiment_chart(filtered_df, px):
+    """按数据来源展示 负面 / 中性 / 正面 评论数量"""
+    if filtered_df.empty:
+        return
+    st.subheader("🧭 情感倾向分布")
+    sentiment_counts = (
+        pd.DataFrame({
+            '数据来源': filtered_df['数据来源'].to_numpy(),
+            '情感倾向': label_scores(filtered_df['情感得分'].to_numpy()),
+        })
+        .groupby(['数据来源', '情感倾向'], observed=False)
+        .size()
+        .reset_index(name='评论数')
+    )
+    def build():
+        fig = px.bar(
+            sentiment_counts,
+            x='数据来源',
+            y='评论数',
+            color='情感倾向',
+            category_orders={'情感倾向': list(SENTIMENT_LABELS)},
+            color_discrete_map={'负面': CHART_COLORS[3], '中性': '#b9b2a2', '正面': CHART_COLORS[4]},
+            height=300
+        )
+        fig.update_layout(
+            margin=dict(l=20, r=20, t=20, b=20),
+            plot_bgcolor='rgba(255,253,246,0.7)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#17201b', family='Noto Sans SC'),
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+        )
+        return fig
+    
+    fig = get_figure(('sentiment', sentiment_counts), build)
+    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+
+def render_source_comparison(distinctive, px):
+    """展示每个数据来源相对其余来源最具区分度的词"""
+    st.subheader("🆚 来源特征词")
+    if distinctive.empty:
+        st.info("各来源之间没有明显差异的词")
+        return
+    
+    sources = list(distinctive['数据来源'].unique())
+    selected_source = st.selectbox("选择数据来源", options=sources, key="compare_source_select")
+    source_terms = distinctive[distinctive['数据来源'] == selected_source].head(20)
+    def build():
+        fig = px.bar(
+            source_terms,
+            x='区分度',
+            y='关键词',
+            orientation='h',
+            hover_data=['出现次数', '来源内占比'],
+            height=max(300, 24 * len(source_terms))
+        )
+        fig.update_layout(
+            margin=dict(l=20, r=20, t=20, b=20),
+            yaxis=dict(autorange='reversed')
+        )
+        return style_bar_chart(fig, CHART_COLORS[2])
+    
+    fig = get_figure(('distinctive', source_terms), build)
+    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+    st.caption("区分度为带先验的对数几率 z 值：越大表示该词在此来源中相对其他来源越常见。")
+    
+    st.subheader("📋 各来源特征词一览")
+    overview = (
+        distinctive.groupby('数据来源', sort=False)['关键词']
+        .apply(lambda words: '、'.join(words.head(10)))
+        .reset_index(name='前 10 个特征词')
+    )
+    st.dataframe(overview, use_container_width=True, hide_index=True)
+
+def render_score_impact(impact, overall_mean, px):
+    """展示拉低 / 拉高评分最多的词及其平均分的置信区间"""
+    if impact.empty:
+        st.info("有评分的评论太少，或没有词达到最少出现次数")
+        return
+    
+    direction = st.radio("排序方向", options=["拉低评分", "拉高评分"], horizontal=True, key="impact_direction")
+    ranked = impact.head(20) if direction == "拉低评分" else impact.tail(20).iloc[::-1]
+    ranked = ranked[ranked['影响值'] < 0] if direction == "拉低评分" else ranked[ranked['影响值'] > 0]
+    if ranked.empty:
+        st.info(f"没有{direction}的词")
+        return
+    
+    st.subheader(f"🎯 {direction}最多的关键词")
+    def build():
+        fig = px.scatter(
+            ranked,
+            x='平均分',
+            y='关键词',
+            size='评论数',
+            error_x=ranked['置信上限'] - ranked['平均分'],
+            hover_data=['评论数', '影响值', '差评率'],
+            height=max(300, 26 * len(ranked))
+        )
+        fig.add_vline(x=overall_mean, line_dash='dash', line_color='#8a6f3a',
+                      annotation_text=f"整体平均 {overall_mean:.2f}")
+        fig.update_traces(marker_color=CHART_COLORS[3] if direction == "拉低评分" else CHART_COLORS[4])
+        fig.update_layout(
+            margin=dict(l=20, r=20, t=30, b=20),
+            yaxis=dict(autorange='reversed'),
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)'
+        )
+        return fig
+    
+    fig = get_figure(('score_impact', ranked, direction, round(overall_mean, 4)), build)
+    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+    st.caption("影响值 = (含该词评论的平均分 - 整体平均分) × 含该词评论数；误差线为平均分的 95% 置信区间，“显著”表示区间不包含整体平均分。")
+    
+    st.subheader("📋 全部关键词评分影响")
+    st.dataframe(impact, use_container_width=True, hide_index=True)
+
+def build_cooccurrence_network(selected_word, partners, edges):
+    """共现网络图：所选词居中，关联词环绕，线宽表示 PMI"""
+    import plotly.graph_objects as go
+    
+    positions = {selected_word: (0.0, 0.0)}
+    for i, word in enumerate(partners['关联词']):
+        angle = 2 * math.pi * i / len(partners)
+        positions[word] = (math.cos(angle), math.sin(angle))
+    
+    fig = go.Figure()
+    strongest = max(edges['PMI'].max(), 1e-9) if not edges.empty else 1.0
+    for edge in edges[edges['PMI'] > 0].itertuples(index=False):
+        (x0, y0), (x1, y1) = positions[edge.词a], positions[edge.词b]
+        fig.add_trace(go.Scatter(
+            x=[x0, x1], y=[y0, y1], mode='lines', hoverinfo='skip',
+            line=dict(width=1 + 5 * edge.PMI / strongest, color='rgba(51,123,135,0.45)')
+        ))
+    words = list(positions)
+    fig.add_trace(go.Scatter(
+        x=[positions[word][0] for word in words],
+        y=[positions[word][1] for word in words],
+        mode='markers+text',
+        text=words,
+        textposition='top center',
+        marker=dict(
+            size=[28] + [12 + 16 * value for value in partners['条件概率']],
+            color=[CHART_COLORS[1]] + [CHART_COLORS[2]] * len(partners)
+        ),
+        hovertext=[f"{selected_word}"] + [
+            f"{row.关联词}：共现 {row.共现评论数} 条，PMI {row.PMI}" for row in partners.itertuples(index=False)
+        ],
+        hoverinfo='text'
+    ))
+    fig.update_layout(
+        height=420,
+        showlegend=False,
+        margin=dict(l=20, r=20, t=20, b=20),
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False, scaleanchor='x'),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)'
+    )
+    return fig
+
+def render_cooccurrence(cooccurrence, selected_word, px, key):
+    """展示与所选关键词共现最强的词，可选展示共现网络"""
+    st.subheader(f"🔗 与「{selected_word}」共现的关键词")
+    order_by = st.radio("排序依据", options=['PMI', '共现评论数'], horizontal=True, key=f"{key}_cooccurrence_order")
+    partners = partner_terms(cooccurrence, selected_word, order_by=order_by)
+    if partners is None or partners.empty:
+        st.info("该词不在共现统计范围内，或没有足够的共现评论")
+        return
+    
+    def build():
+        fig = build_keyword_bar(px, dict(zip(partners['关联词'], partners[order_by])), '关联词', CHART_COLORS[2])
+        fig.update_yaxes(title_text=order_by)
+        return fig
+    
+    fig = get_figure(('cooccurrence', selected_word, order_by, partners), build)
+    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False}, key=f"{key}_cooccurrence_chart")
+    st.caption("提升度 = 两词同时出现的概率 ÷ 各自出现概率之积，PMI = log2(提升度)：大于 0 表示比随机搭配更常一起出现。")
+    
+    if st.checkbox("显示共现网络", key=f"{key}_cooccurrence_network"):
+        edges = partner_edges(cooccurrence, [selected_word] + list(partners['关联词']))
+        fig = get_figure(
+            ('cooccurrence_network', selected_word, partners, edges),
+            lambda: build_cooccurrence_network(selected_word, partners, edges)
+        )
+        st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False}, key=f"{key}_cooccurrence_network_chart")
+
+def render_topics(topic_summary, px):
+    """展示主题规模、关键词与代表评论"""
+    if topic_summary.empty:
+        st.info("评论数量或有效词太少，无法聚类")
+        return
+    
+    st.subheader("🧩 主题分布")
+    def build():
+        fig = px.bar(
+            topic_summary,
+            x=topic_summary['主题'].map(lambda topic: f"主题 {topic}"),
+            y='评论数',
+            hover_data=['关键词', '平均分', '差评率'],
+            labels={'x': '主题'},
+            height=300
+        )
+        fig.update_layout(margin=dict(l=20, r=20, t=20, b=20))
+        return style_bar_chart(fig, CHART_COLORS[4])
+    
+    fig = get_figure(('topics', topic_summary), build)
+    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+    
+    st.subheader("💬 主题详情")
+    for row in topic_summary.itertuples(index=False):
+        avg_score = '-' if pd.isna(row.平均分) else row.平均分
+        with st.expander(f"主题 {row.主题} · {row.评论数} 条 · 平均分 {avg_score} · 差评率 {row.差评率:.0%}"):
+            st.markdown(f"**关键词**：{html.escape(row.关键词)}")
+            render_comment_card(row.代表评论, row.关键词.split('、')[0], "代表评论")
+
+def render_trends(trends, vocab, freq_label, px):
+    """展示各周期的差评率、词典命中率与上升最快的关键词"""
+    periods = trends['periods']
+    if not periods['评论数'].sum():
+        st.info("评价日期列中没有可解析的日期")
+        return
+    
+    st.subheader(f"📅 每{freq_label}差评率与词典命中率")
+    rate_columns = ['差评率', '建议词命中率', '负面词命中率', '负面情感率']
+    def build_rates():
+        long = periods.melt(id_vars=['周期', '评论数'], value_vars=rate_columns, var_name='指标', value_name='比率')
+        fig = px.line(
+            long, x='周期', y='比率', color='指标', markers=True,
+            hover_data=['评论数'], color_discrete_sequence=CHART_COLORS, height=340
+        )
+        fig.update_layout(
+            margin=dict(l=20, r=20, t=20, b=20),
+            yaxis_tickformat='.0%',
+            plot_bgcolor='rgba(255,253,246,0.7)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+        )
+        return fig
+    
+    fig = get_figure(('trend_rates', periods), build_rates)
+    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False}, key="trend_rates")
+    
+    def build_counts():
+        fig = px.bar(periods, x='周期', y='评论数', height=220)
+        fig.update_layout(margin=dict(l=20, r=20, t=10, b=20))
+        return style_bar_chart(fig, CHART_COLORS[2])
+    
+    fig = get_figure(('trend_counts', periods[['周期', '评论数']]), build_counts)
+    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False}, key="trend_counts")
+    
+    st.subheader("🚀 上升最快的关键词")
+    rising = trends['rising']
+    if rising.empty:
+        st.info("周期数不足，或最近一个周期没有明显上升的词")
+        return
+    st.caption(f"最近一{freq_label}与之前一段时间相比，各词出现在评论中的比例；z 值越大，上升越不像随机波动。")
+    st.dataframe(rising, use_container_width=True, hide_index=True)
+    
+    shares = term_shares(trends, vocab, rising['关键词'].head(5))
+    def build_shares():
+        long = shares.rename_axis('周期').reset_index().melt(id_vars='周期', var_name='关键词', value_name='评论占比')
+        fig = px.line(long, x='周期', y='评论占比', color='关键词', markers=True,
+                      color_discrete_sequence=CHART_COLORS, height=300)
+        fig.update_layout(
+            margin=dict(l=20, r=20, t=20, b=20),
+            yaxis_tickformat='.0%',
+            plot_bgcolor='rgba(255,253,246,0.7)',
+            paper_bgcolor='rgba(0,0,0,0)'
+        )
+        return fig
+    
+    fig = get_figure(('trend_shares', shares), build_shares)
+    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False}, key="trend_shares")
+
+def render_cache_stats():
+    """展示进程级缓存的用量与命中情况"""
+    stats = cache_manager.stats()
+    c1, c2 = st.columns(2)
+    with c1:
+        st.metric("缓存占用", f"{stats['used_bytes'] / 2**20:.0f} / {stats['budget_bytes'] / 2**20:.0f} MB")
+        st.metric("命中率", f"{stats['hit_rate']:.0%}")
+    with c2:
+        st.metric("缓存条目", stats['entries'])
+        st.metric("淘汰次数", stats['evictions'] + stats['expirations'])
+    if stats['namespaces']:
+        st.dataframe(
+            pd.DataFrame(
+                [(name, count, round(size / 2**20, 1)) for name, (count, size) in stats['namespaces'].items()],
+                columns=['类别', '条目数', '占用(MB)']
+            ),
+            use_container_width=True,
+            hide_index=True
+        )
+
+@memoize('archive_overview', ttl=0)
+def get_archive_overview(version):
+    """缓存评论库概况与高频词（version 参与缓存键，有新增评论时重新统计）"""
+    frequent = top_terms(15)
+    frequent_low = top_terms(15, low_score_only=True) if len(frequent) else frequent
+    return archive_stats(), frequent, frequent_low
+
+def render_archive_search(low_score_threshold=LOW_SCORE_THRESHOLD):
+    """渲染历史评论库检索面板：在所有入库过的评论中按关键词、差评和日期检索
+
+    折叠的面板在每次页面重跑时也会执行，因此概况按评论库版本缓存，
+    检索只在输入了关键词或点击「检索」后执行。
+    """
+    stats, frequent, frequent_low = get_archive_overview(archive_version())
+    date_range = f"，评价日期 {stats['first_date']} ~ {stats['last_date']}" if stats['first_date'] else ""
+    st.caption(f"评论库共 {stats['comments']} 条评论，来自 {stats['sources']} 个文件{date_range}")
+    
+    # 高频词来自入库时增量累加的词统计，无需读取全部评论
+    if len(frequent):
+        st.caption("高频词：" + "、".join(f"{w}({n})" for w, n in zip(frequent['关键词'], frequent['评论数'])))
+        st.caption("差评高频词：" + "、".join(f"{w}({n})" for w, n in zip(frequent_low['关键词'], frequent_low['差评数'])))
+    
+    c1, c2, c3 = st.columns([2, 1, 2])
+    with c1:
+        keyword = st.text_input("检索关键词", key="archive_keyword", help="按词检索，最后一个词按前缀匹配（如“退”可匹配“退款”）")
+    with c2:
+        low_score_only = st.checkbox("只看差评", key="archive_low_score", help=f"总安排打分不高于 {low_score_threshold} 分")
+    with c3:
+        period = st.date_input("评价日期范围", value=(), key="archive_period")
+    
+    search_clicked = st.button("检索", key="archive_search")
+    if not keyword.strip() and not search_clicked:
+        st.caption("输入关键词或点击「检索」查看匹配的评论")
+        return
+    
+    since = period[0] if len(period) > 0 else None
+    until = period[1] if len(period) > 1 else None
+    started = time.perf_counter()
+    total, results = search_comments(keyword, low_score_only, since, until, low_score_threshold=low_score_threshold)
+    elapsed = (time.perf_counter() - started) * 1000
+    st.caption(f"匹配 {total} 条（显示最近入库的 {len(results)} 条），耗时 {elapsed:.0f} ms")
+    st.dataframe(results, use_container_width=True, hide_index=True)
+
+def render_export_panel(filtered_df, aggregates, score_col, route_col, low_score_threshold):
+    """渲染导出面板：生成文件写入进程专属的临时目录，再提供下载"""
+    export_format = st.radio("导出格式", options=list(EXPORT_FORMATS), horizontal=True, key="export_format")
+    suffix, writer, mime = EXPORT_FORMATS[export_format]
+    
+    if st.button("生成导出文件", key="build_export"):
+        previous = st.session_state.pop('export_file', None)
+        if previous:
+            Path(previous['path']).unlink(missing_ok=True)
+        export_path = new_export_path(suffix)
+        with st.spinner("正在生成导出文件..."):
+            writer(export_path, iter_export_tables(filtered_df, aggregates, score_col, route_col, low_score_threshold))
+        st.session_state.export_file = {'path': export_path, 'suffix': suffix, 'mime': mime}
+    
+    export_file = st.session_state.get('export_file')
+    if export_file and Path(export_file['path']).exists():
+        with open(export_file['path'], 'rb') as f:
+            st.download_button(
+                "下载导出文件",
+                data=f,
+                file_name=f"评论分析结果{export_file['suffix']}",
+                mime=export_file['mime'],
+                key="download_export"
+            )
+
 def render_header():
     """渲染页面标题和说明"""
     st.markdown(f"""
@@ -559,8 +863,8 @@ def render_header():
     </section>
     <div class="steps-grid">
         <div class="step-card">
-            <strong>上传 Excel</strong>
-            <span>支持一次选择多个文件，并自动保留来源，方便横向比较。</span>
+            <strong>上传评论表</strong>
+            <span>支持 Excel、CSV、Parquet，一次选择多个文件，并自动保留来源，方便横向比较。</span>
         </div>
         <div class="step-card">
             <strong>筛选评论</strong>
@@ -580,18 +884,38 @@ def render_header():
 # 主函数
 def main():
     logger.info(f"Python 版本: {sys.version}")
+    start_warm_up()
     
     # 渲染页面主要内容
     render_header()
     
-    uploaded_files = st.file_uploader(
-        "选择Excel文件上传（可多选）",
-        type=['xlsx'],
-        accept_multiple_files=True,
-        help="请上传包含评论数据的Excel文件（.xlsx格式）"
-    )
+    # 评论库存在时可以直接打开已导入的语料（目录监控导入或页面写入），无需上传
+    corpus_mode = "上传文件"
+    if archive_exists():
+        corpus_mode = st.radio(
+            "数据来源",
+            options=["上传文件", "本地评论库"],
+            horizontal=True,
+            key="corpus_mode",
+            help="「本地评论库」直接分析已入库的评论（含 watcher.py 自动导入的文件），无需上传和解析"
+        )
+    
+    uploaded_files = None
+    if corpus_mode == "上传文件":
+        uploaded_files = st.file_uploader(
+            "选择评论文件上传（可多选）",
+            type=SUPPORTED_TYPES,
+            accept_multiple_files=True,
+            help="请上传包含评论数据的文件（.xlsx / .csv / .parquet），表头所在行会自动识别"
+        )
     
-    if uploaded_files:
+    # 历史评论库检索（评论库存在时才显示）
+    if archive_exists():
+        with st.expander("📚 历史评论库", expanded=False):
+            # 差评阈值滑块在下方筛选条件中，取会话中保存的上次取值
+            render_archive_search(st.session_state.get("low_score_threshold", LOW_SCORE_THRESHOLD))
+    
+    if uploaded_files or corpus_mode == "本地评论库":
         # 创建筛选框
         st.markdown("""
         <div class="filter-box">
@@ -603,12 +927,24 @@ def main():
         
         with col1:
             st.markdown('<div class="filter-item">', unsafe_allow_html=True)
-            selected_files = st.multiselect(
-                "📁 选择文件",
-                options=uploaded_files,
-                format_func=lambda x: x.name,
-                help="可以选择多个文件进行合并分析"
-            )
+            if uploaded_files:
+                selected_files = st.multiselect(
+                    "📁 选择文件",
+                    options=uploaded_files,
+                    format_func=lambda x: x.name,
+                    help="可以选择多个文件进行合并分析"
+                )
+            else:
+                source_counts = dict(archive_sources())
+                selected_files = st.multiselect(
+                    "📁 选择文件",
+                    options=list(source_counts),
+                    default=list(source_counts),
+                    format_func=lambda x: f"{x}（{source_counts[x]} 条）",
+                    key="archive_sources",
+                    help="评论库中的来源文件，默认全部选中"
+                )
+            selected_names = [getattr(f, 'name', f) for f in selected_files]
             st.markdown('</div>', unsafe_allow_html=True)
 
         st.markdown('</div>', unsafe_allow_html=True)
@@ -618,6 +954,8 @@ def main():
                 # 初始化筛选条件变量
                 filter_keyword = ""
                 comment_type = ["全部评论"]
+                low_score_threshold = LOW_SCORE_THRESHOLD
+                save_to_archive = False
                 
                 # 创建两列布局：左侧为控制面板，右侧为分析结果
                 control_col, result_col = st.columns([1, 2])
@@ -634,7 +972,7 @@ def main():
                     # 文件信息
                     st.markdown(f"""
                     <div class="file-summary">
-                        分析文件<br><strong>{html.escape(', '.join(f.name for f in selected_files))}</strong>
+                        分析文件<br><strong>{html.escape(', '.join(selected_names))}</strong>
                     </div>
                     """, unsafe_allow_html=True)
                     
@@ -643,9 +981,23 @@ def main():
                         filter_keyword = st.text_input("关键词筛选", help="输入关键词筛选评论")
                         comment_type = st.multiselect(
                             "评论类型",
-                            options=["全部评论", "建议评论", "负面评论"],
+                            options=list(COMMENT_TYPES),
                             default=["全部评论"]
                         )
+                        low_score_threshold = st.slider(
+                            "差评阈值",
+                            min_value=1,
+                            max_value=4,
+                            value=LOW_SCORE_THRESHOLD,
+                            key="low_score_threshold",
+                            help="总安排打分不高于该分数的评论计为差评"
+                        )
+                        if uploaded_files:
+                            save_to_archive = st.checkbox(
+                                "写入本地评论库",
+                                key="save_to_archive",
+                                help="把所选文件的评论存入本地评论库，供跨文件的历史检索（重复导入的行按内容自动跳过）"
+                            )
                     
                     # 词汇管理（折叠面板）
                     with st.expander("⚙️ 词汇管理", expanded=False):
@@ -681,117 +1033,128 @@ def main():
                                     st.session_state.user_stop_words.clear()
                     
                     # 数据处理
-                    all_dfs = []
-                    for file in selected_files:
-                        df = pd.read_excel(file, header=5)
-                        df['数据来源'] = file.name
-                        all_dfs.append(df)
-                    
-                    # 合并所有数据
-                    df = pd.concat(all_dfs, ignore_index=True)
+                    corpus_tokens = None
+                    if uploaded_files:
+                        all_dfs = []
+                        file_digests = []
+                        for file in selected_files:
+                            data = file.getvalue()
+                            all_dfs.append(load_table(data, file.name))
+                            file_digests.append((file.name, hashlib.sha1(data).hexdigest()))
+                        
+                        # 合并所有数据（concat 生成新表，不会改动缓存中的原表）
+                        df = pd.concat(all_dfs, ignore_index=True)
+                    else:
+                        # 评论库语料：入库时已完成解析与分词，数据版本代替文件摘要
+                        version = archive_version()
+                        df, corpus_tokens = get_archive_corpus(version, tuple(selected_files))
+                        file_digests = [('本地评论库', version, tuple(selected_files))]
                     
-                    # 查找路线列和评分列
-                    route_col = None
-                    score_col = None
-                    for col in df.columns:
-                        if '路线名称' in str(col) or '产品名称' in str(col):
-                            route_col = col
-                        if '总安排打分' in str(col):
-                            score_col = col
+                    # 查找路线列、评分列和评价日期列
+                    route_col, score_col = find_columns(df)
+                    date_col = find_date_column(df)
                     
                     if score_col is None:
                         st.error('在上传的文件中未找到"总安排打分"列')
                         return
                     
-                    # 应用筛选条件
-                    mask = pd.Series(True, index=df.index)
-                    
-                    if filter_keyword:
-                        mask = mask & df.iloc[:, 0].str.contains(filter_keyword, na=False)
-                    
-                    if "全部评论" not in comment_type:
-                        if "建议评论" in comment_type:
-                            suggestion_mask = df.iloc[:, 0].str.contains('|'.join(SUGGESTION_WORDS), na=False)
-                            mask = mask & suggestion_mask
-                        if "负面评论" in comment_type:
-                            negative_mask = df.iloc[:, 0].str.contains('|'.join(NEGATIVE_WORDS), na=False)
-                            mask = mask & negative_mask
+                    # 大文件首次分析：完整计算放到后台，先用分层抽样渲染预估结果
+                    preview = None
+                    if len(df) >= PREVIEW_MIN_ROWS:
+                        job = full_analysis_job(
+                            file_digests, df.iloc[:, 0], frozenset(st.session_state.user_stop_words), corpus_tokens
+                        )
+                        if not job.done():
+                            total_rows = len(df)
+                            df, sample_weights = stratified_sample(df, score_col, PREVIEW_SAMPLE_SIZE)
+                            preview = {'total': total_rows, 'weights': sample_weights}
+                            with result_col:
+                                st.warning(
+                                    f"⏳ 数据量较大，当前为 {len(df)} / {total_rows} 条评论的分层抽样（按数据来源 × 评分段）预估结果，"
+                                    "完整计算完成后页面会自动刷新。"
+                                )
+                            watch_full_analysis(job)
                     
-                    filtered_df = df[mask]
+                    # 分析结果按完整筛选状态缓存，切换回算过的组合时直接返回
+                    user_stop_words = frozenset(st.session_state.user_stop_words)
+                    with st.spinner("正在分析..."):
+                        results = get_analysis_results(
+                            tuple(file_digests),
+                            filter_keyword,
+                            tuple(comment_type),
+                            stop_words_version(user_stop_words),
+                            low_score_threshold,
+                            preview is not None,
+                            df,
+                            score_col,
+                            date_col,
+                            None if preview else corpus_tokens,
+                            user_stop_words
+                        )
+                    filtered_df = results['filtered_df']
+                    filtered_matrix = results['filtered_matrix']
+                    term_vocab = results['term_vocab']
+                    aggregates = results['aggregates']
+                    cooccurrence = results['cooccurrence']
                     comments = filtered_df.iloc[:, 0]
                     scores = filtered_df[score_col]
                     
-                    # 计算统计数据
-                    total_comments = len(comments)
-                    low_score_comments = sum(1 for score in scores if score <= 3)
+                    # 写入本地评论库（可选，抽样预览期间等完整结果就绪后再写入）
+                    if save_to_archive and preview is None:
+                        with st.spinner("正在写入本地评论库..."):
+                            added = archive_frame(
+                                corpus_fingerprint(df.iloc[:, 0], tuple(df['数据来源'].unique())),
+                                str(ARCHIVE_PATH),
+                                df,
+                                get_tokens(df.iloc[:, 0]),
+                                route_col,
+                                score_col,
+                                date_col
+                            )
+                        st.caption(f"本地评论库新增 {added} 条评论")
                     
-                    # 数据统计
-                    st.metric("总评论数", total_comments)
-                    st.metric("差评数", low_score_comments)
+                    # 数据统计（抽样预览时按各层权重放大为全量估计值）
+                    if preview:
+                        weights = preview['weights'][results['positions']]
+                        st.metric("总评论数（估计）", f"≈{weights.sum():.0f}")
+                        st.metric("差评数（估计）", f"≈{weights[(scores <= low_score_threshold).to_numpy()].sum():.0f}")
+                        st.metric("负面情感评论数（估计）", f"≈{weights[(filtered_df['情感得分'] < 0).to_numpy()].sum():.0f}")
+                    else:
+                        st.metric("总评论数", results['total'])
+                        st.metric("差评数", results['low_score'])
+                        st.metric("负面情感评论数", results['negative'])
+                    if filter_keyword and archive_exists():
+                        st.caption(f"历史评论库中共有 {count_matches(filter_keyword)} 条评论包含「{filter_keyword}」，可在「历史评论库」中检索")
                     
-                    # 在进入标签页之前，先初始化所有计数器
-                    # 词频统计
-                    word_freq = Counter()
-                    word_freq_low = Counter()
-                    word_comments = {}
-                    word_comments_low = {}
-                    suggestion_freq = Counter()
-                    negative_freq = Counter()
-                    suggestion_comments = {}
-                    negative_comments = {}
+                    word_freq = aggregates['word_freq']
+                    word_freq_low = aggregates['word_freq_low']
+                    word_comments = aggregates['word_comments']
+                    word_comments_low = aggregates['word_comments_low']
+                    suggestion_freq = aggregates['suggestion_freq']
+                    negative_freq = aggregates['negative_freq']
+                    suggestion_comments = aggregates['suggestion_comments']
+                    negative_comments = aggregates['negative_comments']
                     
-                    # 处理评论数据
-                    for comment, source, score in zip(comments, filtered_df['数据来源'], scores):
-                        if pd.isna(comment) or pd.isna(score):
-                            continue
-                        
-                        comment = str(comment).strip()
-                        if not comment:
-                            continue
-                        
-                        words = jieba.cut(comment)
-                        comment_words = set()
-                        
-                        for word in words:
-                            word = word.strip()
-                            if (len(word) > 1 and
-                                word not in STOP_WORDS and
-                                word not in st.session_state.user_stop_words and
-                                not word.isdigit()):
-                                
-                                # 总体词频统计
-                                word_freq[word] += 1
-                                if word not in word_comments:
-                                    word_comments[word] = set()
-                                word_comments[word].add((comment, source))
-                                
-                                # 差评词频统计
-                                if score <= 3:
-                                    word_freq_low[word] += 1
-                                    if word not in word_comments_low:
-                                        word_comments_low[word] = set()
-                                    word_comments_low[word].add((comment, source))
-                                
-                                # 建议词统计
-                                if word in SUGGESTION_WORDS:
-                                    suggestion_freq[word] += 1
-                                    if word not in suggestion_comments:
-                                        suggestion_comments[word] = set()
-                                    suggestion_comments[word].add((comment, source))
-                                
-                                # 负面词统计
-                                if word in NEGATIVE_WORDS:
-                                    negative_freq[word] += 1
-                                    if word not in negative_comments:
-                                        negative_comments[word] = set()
-                                    negative_comments[word].add((comment, source))
+                    # 导出分析结果（折叠面板）
+                    with st.expander("📥 导出结果", expanded=False):
+                        if preview:
+                            st.info("完整计算完成后即可导出")
+                        else:
+                            render_export_panel(filtered_df, aggregates, score_col, route_col, low_score_threshold)
+                    
+                    # 缓存状态（折叠面板）
+                    with st.expander("🧠 缓存状态", expanded=False):
+                        render_cache_stats()
+                    
+                    # 然后在标签页中使用这些（plotly 在首次展示图表时才导入）
+                    import plotly.express as px
                     
-                    # 然后在标签页中使用这些
                     with result_col:
                         # 分析结果标签页
-                        tab1, tab2, tab3, tab4 = st.tabs([
+                        tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
                             "📈 总体分析", "📉 差评分析", 
-                            "💡 建议分析", "😟 负面分析"
+                            "💡 建议分析", "😟 负面分析",
+                            "🆚 来源对比", "🧩 主题聚类", "🎯 评分影响", "📅 时间趋势"
                         ])
 
                         # 总体分析
@@ -804,37 +1167,9 @@ def main():
                                     with col1:
                                         st.subheader("📊 数据来源分布")
                                         source_counts = filtered_df['数据来源'].value_counts()
-                                        fig_source = px.pie(
-                                            values=source_counts.values,
-                                            names=source_counts.index,
-                                            height=300,  # 固定高度
-                                            width=None,  # 自动应宽度
-                                        )
-                                        # 调整饼图布局
-                                        fig_source.update_layout(
-                                            margin=dict(l=20, r=20, t=20, b=20),  # 减小边距
-                                            showlegend=True,  # 显示图例
-                                            legend=dict(
-                                                orientation="h",  # 水平图例
-                                                yanchor="bottom",
-                                                y=1.02,  # 图例位置
-                                                xanchor="right",
-                                                x=1
-                                            ),
-                                            # 调整饼图大小
-                                            autosize=True,  # 自动调整���小
-                                            height=300,  # 固定高度
-                                        )
-                                        # 调整饼图样式
-                                        fig_source.update_traces(
-                                            textposition='inside',  # 文字位置
-                                            textinfo='percent+label',  # 显示百分比和标签
-                                            hole=0.3,  # 添加环形效果
-                                            pull=[0.05] * len(source_counts),  # 轻微分离扇形
-                                            marker=dict(
-                                                colors=CHART_COLORS,
-                                                line=dict(color='white', width=2)  # 添加白色边框
-                                            )
+                                        fig_source = get_figure(
+                                            ('source_pie', tuple(source_counts.items())),
+                                            lambda: build_source_pie(px, source_counts)
                                         )
                                         st.plotly_chart(fig_source, use_container_width=True, config={
                                             'displayModeBar': False  # 隐藏plotly工具栏
@@ -842,50 +1177,23 @@ def main():
                                     
                                     with col2:
                                         st.subheader("☁️ 词云图")
-                                        wc = WordCloud(
-                                            font_path=ensure_font(),
-                                            width=400,
-                                            height=300,
-                                            background_color='white'
-                                        )
-                                        wc.generate_from_frequencies(word_freq)
-                                        st.image(wc.to_array())
+                                        render_wordcloud(word_freq)
                                     
                                     # 第二行：词频统计
                                     st.subheader("📈 词频统计")
                                     top_words = dict(sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:20])
-                                    fig = px.bar(
-                                        x=list(top_words.keys()),
-                                        y=list(top_words.values()),
-                                        labels={'x': '关键词', 'y': '出现次数'},
-                                        height=400  # 固定高度
-                                    )
-                                    fig.update_layout(
-                                        margin=dict(l=20, r=20, t=20, b=80),  # 增加底部边距，为倾斜的标签��出空间
-                                        xaxis_tickangle=-45,  # 标签倾斜角度
-                                        xaxis=dict(
-                                            tickmode='array',
-                                            ticktext=list(top_words.keys()),
-                                            tickvals=list(range(len(top_words))),
-                                            tickfont=dict(size=11)  # 调整字体大小
-                                        ),
-                                        yaxis=dict(
-                                            title=dict(
-                                                text='出现次数',
-                                                font=dict(size=12)
-                                            ),
-                                            tickfont=dict(size=11)
-                                        ),
-                                        bargap=0.2,  # 调整柱子之间的间距
-                                        plot_bgcolor='white',  # 设置背景色为白色
-                                        showlegend=False
+                                    fig = get_figure(
+                                        ('top_words', tuple(top_words.items())),
+                                        lambda: build_top_words_bar(px, top_words)
                                     )
-                                    style_bar_chart(fig, CHART_COLORS[0])
                                     st.plotly_chart(fig, use_container_width=True, config={
                                         'displayModeBar': False  # 隐藏plotly工具栏
                                     })
                                     
-                                    # 第三行：评论详情
+                                    # 第三行：高频短语
+                                    render_phrase_chart(aggregates['phrase_sketches'], px)
+                                    
+                                    # 第四行：评论详情
                                     st.subheader("💬 评论详情")
                                     
                                     selected_word = st.selectbox(
@@ -894,6 +1202,8 @@ def main():
                                     )
                                     
                                     if selected_word:
+                                        render_cooccurrence(cooccurrence, selected_word, px, key="overall")
+                                        
                                         relevant_comments = word_comments.get(selected_word, set())
                                         unique_comments = []
                                         seen_texts = set()
@@ -921,29 +1231,15 @@ def main():
                                     
                                     with viz_col1:
                                         st.subheader("☁️ 差评词云图")
-                                        wc = WordCloud(
-                                            font_path=ensure_font(),
-                                            width=400,
-                                            height=300,
-                                            background_color='white'
-                                        )
-                                        wc.generate_from_frequencies(word_freq_low)
-                                        st.image(wc.to_array())
+                                        render_wordcloud(word_freq_low)
                                     
                                     with viz_col2:
                                         st.subheader("📊 差评词频统计")
                                         top_words_low = dict(sorted(word_freq_low.items(), key=lambda x: x[1], reverse=True)[:20])
-                                        fig = px.bar(
-                                            x=list(top_words_low.keys()),
-                                            y=list(top_words_low.values()),
-                                            labels={'x': '关键词', 'y': '出现次数'},
-                                            height=300  # 固定高度
-                                        )
-                                        fig.update_layout(
-                                            margin=dict(l=20, r=20, t=20, b=20),
-                                            xaxis_tickangle=-45
+                                        fig = get_figure(
+                                            ('keyword_bar', tuple(top_words_low.items()), '关键词', CHART_COLORS[3]),
+                                            lambda: build_keyword_bar(px, top_words_low, '关键词', CHART_COLORS[3])
                                         )
-                                        style_bar_chart(fig, CHART_COLORS[3])
                                         st.plotly_chart(fig, use_container_width=True)
                                     
                                     # 第二行：差评详情
@@ -956,6 +1252,8 @@ def main():
                                     )
                                     
                                     if selected_word:
+                                        render_cooccurrence(cooccurrence, selected_word, px, key="low_score")
+                                        
                                         # 使用网格布局显示评论
                                         cols = st.columns(2)
                                         unique_comments = []
@@ -979,17 +1277,10 @@ def main():
                                     # 第一行：建议词统计
                                     st.subheader("📊 建议关键词统计")
                                     top_suggestions = dict(sorted(suggestion_freq.items(), key=lambda x: x[1], reverse=True)[:20])
-                                    fig = px.bar(
-                                        x=list(top_suggestions.keys()),
-                                        y=list(top_suggestions.values()),
-                                        labels={'x': '建议关键词', 'y': '出现次数'},
-                                        height=300
-                                    )
-                                    fig.update_layout(
-                                        margin=dict(l=20, r=20, t=20, b=20),
-                                        xaxis_tickangle=-45
+                                    fig = get_figure(
+                                        ('keyword_bar', tuple(top_suggestions.items()), '建议关键词', CHART_COLORS[1]),
+                                        lambda: build_keyword_bar(px, top_suggestions, '建议关键词', CHART_COLORS[1])
                                     )
-                                    style_bar_chart(fig, CHART_COLORS[1])
                                     st.plotly_chart(fig, use_container_width=True)
                                     
                                     # 第二行：建议详情
@@ -1002,6 +1293,8 @@ def main():
                                     )
                                     
                                     if selected_word:
+                                        render_cooccurrence(cooccurrence, selected_word, px, key="suggestion")
+                                        
                                         cols = st.columns(2)
                                         unique_comments = []
                                         seen_texts = set()
@@ -1019,6 +1312,9 @@ def main():
 
                         # 负面分析
                         with tab4:
+                            # 情感倾向分布（按数据来源堆叠）
+                            render_sentiment_chart(filtered_df, px)
+                            
                             if negative_freq:
                                 with st.container():
                                     # 第一行：词云图和词频统计
@@ -1026,29 +1322,15 @@ def main():
                                     
                                     with viz_col1:
                                         st.subheader("☁️ 负面情绪词云图")
-                                        wc = WordCloud(
-                                            font_path=ensure_font(),
-                                            width=400,
-                                            height=300,
-                                            background_color='white'
-                                        )
-                                        wc.generate_from_frequencies(negative_freq)
-                                        st.image(wc.to_array())
+                                        render_wordcloud(negative_freq)
                                     
                                     with viz_col2:
                                         st.subheader("📊 负面情绪词统计")
                                         top_negative = dict(sorted(negative_freq.items(), key=lambda x: x[1], reverse=True)[:20])
-                                        fig = px.bar(
-                                            x=list(top_negative.keys()),
-                                            y=list(top_negative.values()),
-                                            labels={'x': '负面情绪词', 'y': '出现次数'},
-                                            height=300  # 固定高度
-                                        )
-                                        fig.update_layout(
-                                            margin=dict(l=20, r=20, t=20, b=20),
-                                            xaxis_tickangle=-45
+                                        fig = get_figure(
+                                            ('keyword_bar', tuple(top_negative.items()), '负面情绪词', CHART_COLORS[3]),
+                                            lambda: build_keyword_bar(px, top_negative, '负面情绪词', CHART_COLORS[3])
                                         )
-                                        style_bar_chart(fig, CHART_COLORS[3])
                                         st.plotly_chart(fig, use_container_width=True)
                                     
                                     # 第二行：负面评论详情
@@ -1061,6 +1343,8 @@ def main():
                                     )
                                     
                                     if selected_word:
+                                        render_cooccurrence(cooccurrence, selected_word, px, key="negative")
+                                        
                                         cols = st.columns(2)
                                         unique_comments = []
                                         seen_texts = set()
@@ -1076,8 +1360,73 @@ def main():
                             else:
                                 st.info("没有找到负面情绪相关的评论")
 
+                        # 来源对比
+                        with tab5:
+                            if filtered_df['数据来源'].nunique() > 1:
+                                render_source_comparison(
+                                    get_distinctive_terms(
+                                        results['fingerprint'],
+                                        filtered_df['数据来源'],
+                                        filtered_matrix,
+                                        term_vocab
+                                    ),
+                                    px
+                                )
+                            else:
+                                st.info("请选择至少两个数据来源进行对比")
+
+                        # 主题聚类
+                        with tab6:
+                            n_topics = st.slider("主题数量", min_value=2, max_value=15, value=8, key="topic_count")
+                            with st.spinner("正在进行主题聚类..."):
+                                topic_summary, _ = get_topics(
+                                    results['fingerprint'],
+                                    n_topics,
+                                    low_score_threshold,
+                                    filtered_matrix,
+                                    term_vocab,
+                                    comments,
+                                    scores
+                                )
+                            render_topics(topic_summary, px)
+
+                        # 评分影响
+                        with tab7:
+                            min_count = st.slider("最少出现评论数", min_value=2, max_value=200, value=20, key="impact_min_count")
+                            impact, overall_mean = get_score_impact(
+                                results['fingerprint'],
+                                min_count,
+                                low_score_threshold,
+                                scores,
+                                filtered_matrix,
+                                term_vocab
+                            )
+                            render_score_impact(impact, overall_mean, px)
+
+                        # 时间趋势
+                        with tab8:
+                            if date_col is None:
+                                st.info("未找到评价日期列（列名含“评价时间”、“日期”等且大部分值为日期）")
+                            else:
+                                freq_label = st.radio("周期", options=list(TREND_FREQS), horizontal=True, key="trend_freq")
+                                with st.spinner("正在统计时间趋势..."):
+                                    trends = get_trends(
+                                        results['fingerprint'],
+                                        TREND_FREQS[freq_label],
+                                        low_score_threshold,
+                                        date_col,
+                                        filtered_df[date_col],
+                                        scores,
+                                        filtered_df['情感得分'],
+                                        filtered_matrix,
+                                        term_vocab
+                                    )
+                                st.caption(f"按「{date_col}」列统计")
+                                render_trends(trends, term_vocab, freq_label, px)
+
             except Exception as e:
                 st.error(f"处理文件时出错: {str(e)}")
 
 if __name__ == "__main__":
     main()
+    log_first_render(start_warm_up())
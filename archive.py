@@ -0,0 +1,365 @@
+# 本地评论库：把导入过的评论存入 SQLite，按内容哈希去重，并用 FTS5 建立全文索引
+
+# 标准库导入
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from contextlib import closing
+
+# 第三方库导入
+import pandas as pd
+
+# 本地模块导入
+from analysis import LOW_SCORE_THRESHOLD, CLAUSE_BREAKS, get_tokenizer, tokenize_comments, is_valid_word
+
+logger = logging.getLogger(__name__)
+
+# 评论库路径，可用环境变量覆盖
+ARCHIVE_PATH = Path(os.environ.get(
+    'COMMENT_ARCHIVE_PATH',
+    Path(__file__).parent / 'data' / 'comments.db'
+))
+
+INSERT_BATCH_SIZE = 5000
+SEARCH_LIMIT = 500
+# SQLite 旧版本单条语句最多 999 个参数，按内容哈希查重时分批查询
+LOOKUP_BATCH_SIZE = 500
+# 完整分词结果以不可见分隔符连接存储（分词结果已去掉首尾空白，不含该字符）
+TOKEN_SEPARATOR = '\x1f'
+
+# FTS5 的 unicode61 分词器会把连续汉字当作一个词，因此入库前先用 jieba 切分，
+# 以空格连接后写入 tokens 列；外部内容表由触发器同步，重复行被忽略时不会写索引。
+# token_list 保存含标点的完整分词结果，从评论库打开语料时无需重新分词；
+# term_stats 是各词出现的评论数，随每批新增评论增量累加
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL UNIQUE,
+    comment TEXT NOT NULL,
+    tokens TEXT NOT NULL,
+    source TEXT,
+    route TEXT,
+    score REAL,
+    comment_date TEXT,
+    imported_at TEXT NOT NULL,
+    token_list TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_comments_date ON comments(comment_date);
+CREATE INDEX IF NOT EXISTS idx_comments_source ON comments(source);
+CREATE TABLE IF NOT EXISTS term_stats (
+    word TEXT PRIMARY KEY,
+    comments INTEGER NOT NULL DEFAULT 0,
+    low_score_comments INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS ingested_files (
+    file_hash TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    rows INTEGER NOT NULL,
+    added INTEGER NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(
+    tokens,
+    content='comments',
+    content_rowid='id',
+    prefix='1 2'
+);
+CREATE TRIGGER IF NOT EXISTS comments_ai AFTER INSERT ON comments BEGIN
+    INSERT INTO comments_fts(rowid, tokens) VALUES (new.id, new.tokens);
+END;
+CREATE TRIGGER IF NOT EXISTS comments_ad AFTER DELETE ON comments BEGIN
+    INSERT INTO comments_fts(comments_fts, rowid, tokens) VALUES ('delete', old.id, old.tokens);
+END;
+"""
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+def connect(path=ARCHIVE_PATH):
+    """打开评论库连接（每次调用新建连接，可在任意线程使用），首次打开时建表"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    with _schema_lock:
+        if str(path) not in _schema_ready:
+            _migrate(conn)
+            conn.executescript(SCHEMA)
+            _schema_ready.add(str(path))
+    return conn
+
+def _migrate(conn):
+    """旧版评论库补充 token_list 列，并按已入库的索引文本重建词统计"""
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(comments)')]
+    if not columns or 'token_list' in columns:
+        return
+    conn.execute('ALTER TABLE comments ADD COLUMN token_list TEXT')
+    conn.executescript(SCHEMA)
+    with conn:
+        conn.execute('DELETE FROM term_stats')
+        for start in range(0, conn.execute('SELECT COALESCE(MAX(id), 0) FROM comments').fetchone()[0] + 1, INSERT_BATCH_SIZE):
+            rows = conn.execute(
+                'SELECT tokens, score FROM comments WHERE id >= ? AND id < ?',
+                (start, start + INSERT_BATCH_SIZE)
+            ).fetchall()
+            _update_term_stats(conn, [(tokens.split(), score) for tokens, score in rows])
+    logger.info("评论库已升级：新增 token_list 列并重建词统计")
+
+def archive_exists(path=ARCHIVE_PATH):
+    """评论库文件是否已存在"""
+    return Path(path).exists()
+
+def _index_text(tokens):
+    """把分词结果转换为写入全文索引的文本（去掉标点与空白）"""
+    return ' '.join(token for token in tokens if token not in CLAUSE_BREAKS and token.strip())
+
+def _content_hash(comment, route, score, comment_date, occurrence=0):
+    """按评论内容及路线、评分、日期计算哈希，同一行重复导入时哈希相同
+
+    occurrence 为该行在文件内是第几次重复出现：内容相同的不同评论（如多条"很好"）
+    各自保留，重新导入同一文件时仍按哈希去重。第一次出现时不参与计算，与旧库兼容。
+    """
+    values = (comment, route, score, comment_date) + ((occurrence,) if occurrence else ())
+    key = '\x1f'.join('' if pd.isna(value) else str(value) for value in values)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def _date_texts(values):
+    """日期统一存为 ISO 格式文本，便于按区间查询；无法解析的记为空"""
+    parsed = pd.to_datetime(values, errors='coerce', format='mixed')
+    return parsed.dt.strftime('%Y-%m-%d').astype(object).where(parsed.notna(), None)
+
+def _existing_hashes(conn, hashes):
+    """返回已在评论库中的内容哈希"""
+    existing = set()
+    for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+        batch = hashes[start:start + LOOKUP_BATCH_SIZE]
+        existing.update(row[0] for row in conn.execute(
+            f'SELECT content_hash FROM comments WHERE content_hash IN ({",".join("?" * len(batch))})', batch
+        ))
+    return existing
+
+def _update_term_stats(conn, rows):
+    """按新增评论累加各词的评论数（每条评论中同一个词只计一次，差评按默认阈值计）"""
+    counts = {}
+    for tokens, score in rows:
+        low = score is not None and score <= LOW_SCORE_THRESHOLD
+        for word in set(tokens):
+            if not is_valid_word(word):
+                continue
+            total, low_total = counts.get(word, (0, 0))
+            counts[word] = (total + 1, low_total + low)
+    conn.executemany(
+        'INSERT INTO term_stats (word, comments, low_score_comments) VALUES (?, ?, ?) '
+        'ON CONFLICT(word) DO UPDATE SET comments = comments + excluded.comments, '
+        'low_score_comments = low_score_comments + excluded.low_score_comments',
+        [(word, total, low_total) for word, (total, low_total) in counts.items()]
+    )
+
+def archive_comments(df, token_lists=None, route_col=None, score_col=None, date_col=None, path=ARCHIVE_PATH):
+    """把评论写入评论库，返回新增行数（已存在的行按内容哈希跳过）
+
+    df 的第一列为评论内容，'数据来源' 列为文件名；token_lists 与 df 行一一对应，
+    为 None 时只对库中尚不存在的评论分词。新增评论同时累加到词统计中。
+    """
+    imported_at = time.strftime('%Y-%m-%d %H:%M:%S')
+    comments = df.iloc[:, 0]
+    routes = df[route_col] if route_col is not None else pd.Series(None, index=df.index)
+    scores = pd.to_numeric(df[score_col], errors='coerce') if score_col is not None else pd.Series(None, index=df.index)
+    dates = _date_texts(df[date_col]) if date_col is not None else pd.Series(None, index=df.index)
+
+    # 文件内内容相同的行按出现次序编号后计算哈希，再排除库中已有的评论
+    candidates, occurrences = {}, {}
+    for position, (comment, source, route, score, comment_date) in enumerate(zip(
+            comments, df['数据来源'], routes, scores, dates)):
+        if pd.isna(comment) or not str(comment).strip():
+            continue
+        route = None if pd.isna(route) else str(route)
+        score = None if pd.isna(score) else float(score)
+        base_hash = _content_hash(comment, route, score, comment_date)
+        occurrence = occurrences.get(base_hash, 0)
+        occurrences[base_hash] = occurrence + 1
+        content_hash = _content_hash(comment, route, score, comment_date, occurrence)
+        candidates[content_hash] = (position, str(comment), source, route, score, comment_date)
+
+    with closing(connect(path)) as conn:
+        existing = _existing_hashes(conn, list(candidates))
+        new_rows = [(content_hash, *row) for content_hash, row in candidates.items() if content_hash not in existing]
+        if token_lists is None:
+            new_tokens = tokenize_comments([row[2] for row in new_rows])
+        else:
+            new_tokens = [token_lists[row[1]] for row in new_rows]
+
+        # 分词在事务外完成；写事务内再查一次重，其他进程同时写入的评论不会重复计入词统计
+        conn.isolation_level = None
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            existing = _existing_hashes(conn, [row[0] for row in new_rows])
+            batch = [
+                (content_hash, comment, _index_text(tokens), source, route, score, comment_date,
+                 imported_at, TOKEN_SEPARATOR.join(tokens))
+                for (content_hash, _, comment, source, route, score, comment_date), tokens in zip(new_rows, new_tokens)
+                if content_hash not in existing
+            ]
+            for start in range(0, len(batch), INSERT_BATCH_SIZE):
+                conn.executemany(
+                    'INSERT INTO comments '
+                    '(content_hash, comment, tokens, source, route, score, comment_date, imported_at, token_list) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    batch[start:start + INSERT_BATCH_SIZE]
+                )
+            _update_term_stats(conn, [(row[8].split(TOKEN_SEPARATOR) if row[8] else [], row[5]) for row in batch])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    logger.info(f"评论库新增 {len(batch)} 条评论（分词 {len(new_rows)} 条）")
+    return len(batch)
+
+def build_match_query(keyword):
+    """把关键词切分为 FTS5 短语查询，最后一个词按前缀匹配（"退" 可以匹配 "退款"）"""
+    tokens = [token for token in get_tokenizer().lcut(keyword.strip()) if _index_text([token])]
+    if not tokens:
+        return None
+    phrase = ' '.join(token.replace('"', '""') for token in tokens)
+    return f'"{phrase}" *'
+
+def _query_parts(keyword, low_score_only, since, until, low_score_threshold=LOW_SCORE_THRESHOLD):
+    """组合全文检索与评分、日期条件，返回 (FROM 子句, WHERE 子句, 参数, 排序列)
+
+    有关键词时从全文索引出发连接评论表，结果按 rowid 倒序直接由索引给出，无需排序。
+    """
+    tables, order = 'comments c', 'c.id'
+    conditions, params = [], []
+    if keyword:
+        query = build_match_query(keyword)
+        if query is None:
+            return None, None, None, None
+        tables, order = 'comments_fts f JOIN comments c ON c.id = f.rowid', 'f.rowid'
+        conditions.append('comments_fts MATCH ?')
+        params.append(query)
+    if low_score_only:
+        conditions.append('c.score <= ?')
+        params.append(low_score_threshold)
+    if since is not None:
+        conditions.append('c.comment_date >= ?')
+        params.append(str(since))
+    if until is not None:
+        conditions.append('c.comment_date <= ?')
+        params.append(str(until))
+    where = (' WHERE ' + ' AND '.join(conditions)) if conditions else ''
+    return tables, where, params, order
+
+def search_comments(keyword='', low_score_only=False, since=None, until=None, limit=SEARCH_LIMIT, path=ARCHIVE_PATH,
+                    low_score_threshold=LOW_SCORE_THRESHOLD):
+    """在评论库中检索，返回 (匹配总数, 最近入库的 limit 条结果)；只看差评时按 low_score_threshold 过滤"""
+    columns = ['评论内容', '数据来源', '路线', '总安排打分', '评价日期', '入库时间']
+    tables, where, params, order = _query_parts(keyword, low_score_only, since, until, low_score_threshold)
+    if tables is None:
+        return 0, pd.DataFrame(columns=columns)
+    with closing(connect(path)) as conn:
+        if keyword and not low_score_only and since is None and until is None:
+            # 只有关键词条件时直接在全文索引上计数
+            total = conn.execute('SELECT COUNT(*) FROM comments_fts WHERE comments_fts MATCH ?', params).fetchone()[0]
+        else:
+            total = conn.execute(f'SELECT COUNT(*) FROM {tables}{where}', params).fetchone()[0]
+        rows = conn.execute(
+            'SELECT c.comment, c.source, c.route, c.score, c.comment_date, c.imported_at '
+            f'FROM {tables}{where} ORDER BY {order} DESC LIMIT ?',
+            params + [limit]
+        ).fetchall() if limit else []
+    return total, pd.DataFrame(rows, columns=columns)
+
+def count_matches(keyword, path=ARCHIVE_PATH):
+    """评论库中包含关键词的评论数"""
+    return search_comments(keyword, limit=0, path=path)[0]
+
+def archive_stats(path=ARCHIVE_PATH):
+    """评论库概况：评论数、来源文件数、日期范围"""
+    with closing(connect(path)) as conn:
+        total, sources, first, last = conn.execute(
+            'SELECT COUNT(*), COUNT(DISTINCT source), MIN(comment_date), MAX(comment_date) FROM comments'
+        ).fetchone()
+    return {'comments': total, 'sources': sources, 'first_date': first, 'last_date': last}
+
+def archive_version(path=ARCHIVE_PATH):
+    """评论库的数据版本（评论数与最大行号），有新增评论时变化，用作缓存键"""
+    with closing(connect(path)) as conn:
+        return conn.execute('SELECT COUNT(*), COALESCE(MAX(id), 0) FROM comments').fetchone()
+
+def archive_sources(path=ARCHIVE_PATH):
+    """评论库中的来源文件及各自的评论数，按最近入库排序"""
+    with closing(connect(path)) as conn:
+        return conn.execute(
+            'SELECT source, COUNT(*) FROM comments GROUP BY source ORDER BY MAX(id) DESC'
+        ).fetchall()
+
+def load_corpus(sources, path=ARCHIVE_PATH):
+    """读取指定来源的评论，返回 (DataFrame, 分词结果)，列与上传文件的分析口径一致
+
+    入库时保存的完整分词直接复用；升级前入库、没有完整分词的评论在这里补分词。
+    """
+    columns = ['评论内容', '路线名称', '总安排打分', '评价日期', '数据来源']
+    frames, token_texts = [], []
+    with closing(connect(path)) as conn:
+        for source in sources:
+            rows = conn.execute(
+                'SELECT comment, route, score, comment_date, source, token_list '
+                'FROM comments WHERE source = ? ORDER BY id', (source,)
+            ).fetchall()
+            frames.append(pd.DataFrame([row[:5] for row in rows], columns=columns))
+            token_texts.extend(row[5] for row in rows)
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+    df['总安排打分'] = pd.to_numeric(df['总安排打分'], errors='coerce')
+
+    token_lists = [text.split(TOKEN_SEPARATOR) if text else [] for text in token_texts]
+    missing = [i for i, text in enumerate(token_texts) if text is None]
+    if missing:
+        for i, tokens in zip(missing, tokenize_comments(df['评论内容'].iloc[missing])):
+            token_lists[i] = tokens
+    return df, token_lists
+
+def top_terms(limit=20, low_score_only=False, path=ARCHIVE_PATH):
+    """按增量维护的词统计返回出现评论数最多的词"""
+    order = 'low_score_comments' if low_score_only else 'comments'
+    with closing(connect(path)) as conn:
+        rows = conn.execute(
+            f'SELECT word, comments, low_score_comments FROM term_stats WHERE {order} > 0 '
+            f'ORDER BY {order} DESC, word LIMIT ?', (limit,)
+        ).fetchall()
+    return pd.DataFrame(rows, columns=['关键词', '评论数', '差评数'])
+
+def file_ingested(file_hash, path=ARCHIVE_PATH):
+    """该内容的文件是否已导入过（按文件内容哈希判断，与文件名无关）"""
+    with closing(connect(path)) as conn:
+        return conn.execute('SELECT 1 FROM ingested_files WHERE file_hash = ?', (file_hash,)).fetchone() is not None
+
+def ingested_file_path(file_hash, path=ARCHIVE_PATH):
+    """按文件内容哈希查找导入时的文件路径，未导入过时返回 None"""
+    with closing(connect(path)) as conn:
+        row = conn.execute('SELECT path FROM ingested_files WHERE file_hash = ?', (file_hash,)).fetchone()
+    return row[0] if row else None
+
+def list_ingested_files(path=ARCHIVE_PATH):
+    """已导入文件的记录，按导入时间倒序"""
+    with closing(connect(path)) as conn:
+        rows = conn.execute(
+            'SELECT file_hash, path, rows, added, ingested_at FROM ingested_files ORDER BY ingested_at DESC'
+        ).fetchall()
+    return [dict(zip(('hash', 'path', 'rows', 'added', 'ingested_at'), row)) for row in rows]
+
+def record_ingested_file(file_hash, file_path, size, mtime, rows, added, path=ARCHIVE_PATH):
+    """记录已导入的文件"""
+    with closing(connect(path)) as conn:
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO ingested_files (file_hash, path, size, mtime, rows, added, ingested_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (file_hash, str(file_path), size, mtime, rows, added, time.strftime('%Y-%m-%d %H:%M:%S'))
+            )
@@ -0,0 +1,252 @@
+# 进程级缓存管理：全局字节预算、按条目估算大小、LRU/TTL 淘汰与命中统计
+
+# 标准库导入
+import os
+import sys
+import time
+import hashlib
+import inspect
+import logging
+import threading
+import functools
+from collections import OrderedDict
+
+# 第三方库导入
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 缓存预算与默认过期时间，可通过环境变量调整
+CACHE_BUDGET_MB = int(os.environ.get('CACHE_BUDGET_MB', 1024))
+CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS', 3600))
+
+# 超过该长度的容器按抽样估算大小，避免逐项遍历数百万个元素
+SIZE_SAMPLE_LIMIT = 1000
+
+def estimate_size(value, _seen=None):
+    """估算对象占用的字节数（共享对象只计一次）"""
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return value.nbytes + _estimate_items(value.ravel(), _seen)
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True, index=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, pd.Index):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, pd.Categorical):
+        return int(value.memory_usage(deep=True))
+    if hasattr(value, 'tocsr') and hasattr(value, 'nnz'):
+        # scipy 稀疏矩阵
+        return sum(
+            getattr(value, name).nbytes
+            for name in ('data', 'indices', 'indptr', 'row', 'col')
+            if isinstance(getattr(value, name, None), np.ndarray)
+        )
+    if isinstance(value, (str, bytes, bytearray, int, float, bool)) or value is None:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + _estimate_items(
+            [item for pair in value.items() for item in pair], _seen
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + _estimate_items(list(value), _seen)
+    if hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + estimate_size(vars(value), _seen)
+    return sys.getsizeof(value)
+
+def _estimate_items(items, _seen):
+    """估算容器内元素的大小，元素过多时抽样后按比例放大"""
+    count = len(items)
+    if count <= SIZE_SAMPLE_LIMIT:
+        return sum(estimate_size(item, _seen) for item in items)
+    step = count / SIZE_SAMPLE_LIMIT
+    sampled = sum(estimate_size(items[int(i * step)], _seen) for i in range(SIZE_SAMPLE_LIMIT))
+    return int(sampled * step)
+
+def _update_digest(digest, value):
+    """把参数内容写入摘要，pandas/numpy 对象按内容而非身份哈希
+
+    Series/DataFrame 的列名与索引也计入摘要（如趋势表的列名是关键词、索引是周期），
+    值相同而标签不同的表不会共用缓存。
+    """
+    if isinstance(value, (pd.Series, pd.DataFrame, pd.Index)):
+        digest.update(type(value).__name__.encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+        if isinstance(value, pd.DataFrame):
+            _update_digest(digest, value.columns)
+        elif isinstance(value, pd.Series):
+            digest.update(repr(value.name).encode('utf-8'))
+        if not isinstance(value, pd.Index):
+            _update_digest(digest, value.index)
+    elif isinstance(value, np.ndarray):
+        digest.update(f'{value.dtype}{value.shape}'.encode('utf-8'))
+        if value.dtype == object:
+            digest.update(pd.util.hash_array(value.ravel()).tobytes())
+        else:
+            digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (bytes, bytearray)):
+        digest.update(value)
+    elif isinstance(value, (set, frozenset)):
+        digest.update(repr(sorted(value, key=repr)).encode('utf-8'))
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'{type(value).__name__}{len(value)}'.encode('utf-8'))
+        for item in value:
+            _update_digest(digest, item)
+    elif isinstance(value, dict):
+        _update_digest(digest, sorted(value.items(), key=lambda x: repr(x[0])))
+    else:
+        digest.update(repr(value).encode('utf-8'))
+    digest.update(b'|')
+
+class CacheManager:
+    """带字节预算的 LRU/TTL 缓存，线程安全，整个进程共享一份"""
+
+    def __init__(self, budget_bytes, ttl=CACHE_TTL_SECONDS):
+        self.budget_bytes = budget_bytes
+        self.ttl = ttl
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._key_locks = {}
+
+    def get(self, key, record=True):
+        """返回 (是否命中, 值)，命中时把条目移到最近使用端"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += record
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += record
+            return True, entry[0]
+
+    def put(self, key, value, ttl=None, size=None):
+        """写入条目并按 LRU 淘汰，单个条目超过预算时不缓存"""
+        size = estimate_size(value) if size is None else size
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.budget_bytes:
+                self._key_locks.pop(key, None)
+                self.rejections += 1
+                logger.warning(f"缓存条目 {key[0]} 大小 {size / 2**20:.1f}MB 超出预算，未缓存")
+                return
+            self._purge_expired()
+            while self._entries and self.used_bytes + size > self.budget_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            self._entries[key] = (value, size, expires_at)
+            self.used_bytes += size
+
+    def key_lock(self, key):
+        """同一键的计算串行化，避免多个会话同时重复计算"""
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def release_key_lock(self, key):
+        """键没有对应的缓存条目时移除其计算锁"""
+        with self._lock:
+            if key not in self._entries:
+                self._key_locks.pop(key, None)
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.used_bytes -= size
+        self._key_locks.pop(key, None)
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        expired = [key for key, (_, _, expires_at) in self._entries.items()
+                   if expires_at is not None and expires_at < now]
+        for key in expired:
+            self._remove(key)
+            self.expirations += 1
+
+    def clear(self):
+        """清空全部条目（统计计数保留）"""
+        with self._lock:
+            self._entries.clear()
+            self._key_locks.clear()
+            self.used_bytes = 0
+
+    def stats(self):
+        """返回缓存用量与命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            by_namespace = {}
+            for (namespace, _), (_, size, _) in self._entries.items():
+                count, total = by_namespace.get(namespace, (0, 0))
+                by_namespace[namespace] = (count + 1, total + size)
+            return {
+                'entries': len(self._entries),
+                'used_bytes': self.used_bytes,
+                'budget_bytes': self.budget_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'rejections': self.rejections,
+                'namespaces': by_namespace,
+            }
+
+# 进程内唯一的缓存实例（模块只导入一次，所有会话共享）
+cache_manager = CacheManager(CACHE_BUDGET_MB * 2**20)
+
+def memoize(namespace, ttl=None):
+    """把函数结果存入共享缓存
+
+    与 st.cache_* 相同，以下划线开头的参数不参与缓存键；
+    返回值在会话之间共享，调用方不得修改。
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            digest = hashlib.sha1()
+            for name, value in bound.arguments.items():
+                if not name.startswith('_'):
+                    digest.update(name.encode('utf-8'))
+                    _update_digest(digest, value)
+            key = (namespace, digest.hexdigest())
+
+            found, value = cache_manager.get(key)
+            if found:
+                return value
+            with cache_manager.key_lock(key):
+                found, value = cache_manager.get(key, record=False)
+                if found:
+                    return value
+                try:
+                    value = func(*args, **kwargs)
+                    cache_manager.put(key, value, ttl=ttl)
+                    return value
+                finally:
+                    # 计算出错或结果超出预算未写入时，键锁不会随条目淘汰释放，在此移除
+                    cache_manager.release_key_lock(key)
+
+        return wrapper
+    return decorator
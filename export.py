@@ -0,0 +1,158 @@
+# 分析结果导出：直接读取已缓存的聚合结果，逐行写出 xlsx / csv
+
+# 标准库导入
+import io
+import os
+import csv
+import time
+import zipfile
+import datetime
+import tempfile
+import threading
+from pathlib import Path
+
+# 第三方库导入
+import pandas as pd
+
+# 本地模块导入
+from analysis import LOW_SCORE_THRESHOLD
+
+# 四个分析视角对应的 (表名, 词频键, 关联评论键)
+VIEW_TABLES = [
+    ('总体词频', 'word_freq', 'word_comments'),
+    ('差评词频', 'word_freq_low', 'word_comments_low'),
+    ('建议词频', 'suggestion_freq', 'suggestion_comments'),
+    ('负面词频', 'negative_freq', 'negative_comments'),
+]
+
+# 导出文件写入进程专属的临时目录，进程退出时整个目录删除；
+# 会话放弃下载留下的文件超过该时长后在下次导出时清理
+EXPORT_FILE_TTL = 3600
+
+_export_dir = None
+_export_dir_lock = threading.Lock()
+
+def new_export_path(suffix):
+    """在进程专属的导出目录中分配一个新文件路径，并清理过期的导出文件"""
+    global _export_dir
+    with _export_dir_lock:
+        if _export_dir is None:
+            _export_dir = tempfile.TemporaryDirectory(prefix='comment-export-')
+        directory = Path(_export_dir.name)
+    cutoff = time.time() - EXPORT_FILE_TTL
+    for stale in directory.iterdir():
+        try:
+            if stale.stat().st_mtime < cutoff:
+                stale.unlink()
+        except FileNotFoundError:
+            pass
+    fd, path = tempfile.mkstemp(prefix='export-', suffix=suffix, dir=directory)
+    os.close(fd)
+    return path
+
+def _cell(value):
+    """把单元格值转换为写出器可接受的类型"""
+    if value is None:
+        return None
+    if isinstance(value, (pd.Timestamp, datetime.datetime, datetime.date)):
+        return None if pd.isna(value) else value.isoformat()
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+def iter_export_tables(filtered_df, aggregates, score_col, route_col=None, low_score_threshold=LOW_SCORE_THRESHOLD):
+    """按表依次产出 (表名, 表头, 行迭代器)，行均为惰性生成"""
+    # 评论明细：按列 zip，避免 itertuples/拷贝带来的额外内存
+    comment_col = filtered_df.columns[0]
+    detail_cols = [comment_col, '数据来源']
+    if route_col is not None:
+        detail_cols.append(route_col)
+    detail_cols.append(score_col)
+    if '情感得分' in filtered_df.columns:
+        detail_cols.append('情感得分')
+    yield (
+        '评论明细',
+        [str(col) for col in detail_cols],
+        zip(*(filtered_df[col] for col in detail_cols))
+    )
+
+    # 各视角词频表
+    for table_name, freq_key, comments_key in VIEW_TABLES:
+        freq = aggregates[freq_key]
+        related = aggregates[comments_key]
+        yield (
+            table_name,
+            ['关键词', '出现次数', '相关评论数'],
+            ((word, count, len(related.get(word, ()))) for word, count in freq.most_common())
+        )
+
+    # 高频短语（草图估计值，误差为可能的高估上限）
+    yield (
+        '高频短语',
+        ['短语', '词数', '出现次数', '误差上界'],
+        (
+            (phrase, size, count, error)
+            for size, sketch in aggregates['phrase_sketches'].items()
+            for phrase, count, error in sketch.top(len(sketch))
+        )
+    )
+
+    # 来源统计
+    scores = pd.to_numeric(filtered_df[score_col], errors='coerce')
+    grouped = scores.groupby(filtered_df['数据来源'])
+    summary = pd.DataFrame({
+        'total': grouped.size(),
+        'low': (scores <= low_score_threshold).groupby(filtered_df['数据来源']).sum(),
+        'avg': grouped.mean(),
+    })
+    yield (
+        '来源统计',
+        ['数据来源', '评论数', '差评数', '差评率', '平均分'],
+        (
+            (source, total, low,
+             round(low / total, 4) if total else None,
+             round(avg, 2) if pd.notna(avg) else None)
+            for source, total, low, avg in summary.itertuples(name=None)
+        )
+    )
+
+    # 来源词频
+    yield (
+        '来源词频',
+        ['数据来源', '关键词', '出现次数'],
+        (
+            (source, word, count)
+            for source, freq in aggregates['source_word_freq'].items()
+            for word, count in freq.most_common()
+        )
+    )
+
+def write_xlsx(path, tables):
+    """以 constant_memory 模式写出 xlsx，每行写完即刷盘"""
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'strings_to_urls': False})
+    try:
+        header_format = workbook.add_format({'bold': True})
+        for table_name, header, rows in tables:
+            worksheet = workbook.add_worksheet(table_name)
+            worksheet.write_row(0, 0, header, header_format)
+            for row_idx, row in enumerate(rows, start=1):
+                worksheet.write_row(row_idx, 0, [_cell(value) for value in row])
+    finally:
+        workbook.close()
+
+def write_csv_zip(path, tables):
+    """把每张表写成一个 CSV（UTF-8 BOM，兼容 Excel），打包为 zip"""
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for table_name, header, rows in tables:
+            with archive.open(f'{table_name}.csv', 'w') as raw:
+                text = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+                writer = csv.writer(text)
+                writer.writerow(header)
+                for row in rows:
+                    writer.writerow([_cell(value) for value in row])
+                text.flush()
+                text.detach()
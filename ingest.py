@@ -0,0 +1,171 @@
+# 数据读取：支持 xlsx / csv / parquet，自动识别表头所在行，csv 与 parquet 分块读取
+
+# 标准库导入
+import io
+import csv
+import codecs
+from pathlib import Path
+
+# 第三方库导入
+import pandas as pd
+
+# 本地模块导入
+from analysis import find_columns
+
+SUPPORTED_TYPES = ['xlsx', 'csv', 'parquet']
+
+# 表头识别：在前若干行中查找评分列与路线列的列名；都找不到时沿用旧报表的第 6 行
+SCORE_MARKER = '总安排打分'
+ROUTE_MARKERS = ('路线名称', '产品名称')
+HEADER_SCAN_ROWS = 30
+DEFAULT_HEADER_ROW = 5
+
+# 分块大小：csv 按字节分块解析，parquet 按行组内的批次读取
+CSV_BLOCK_SIZE = 4 << 20
+PARQUET_BATCH_ROWS = 65536
+CSV_SAMPLE_BYTES = 64 << 10
+CSV_ENCODINGS = ('utf-8-sig', 'gb18030')
+
+def detect_header_row(rows):
+    """返回表头所在的行号：优先同时含评分列与路线列的行，其次只含评分列的行"""
+    fallback = None
+    for index, row in enumerate(rows):
+        cells = [str(cell) for cell in row if cell is not None and not pd.isna(cell)]
+        if not any(SCORE_MARKER in cell for cell in cells):
+            continue
+        if any(marker in cell for cell in cells for marker in ROUTE_MARKERS):
+            return index
+        if fallback is None:
+            fallback = index
+    return fallback
+
+def _column_names(header):
+    """把表头行转换为列名，空列名与重复列名的处理方式与 pandas 一致"""
+    names = []
+    seen = {}
+    for index, cell in enumerate(header):
+        name = str(cell).strip() if cell is not None and str(cell).strip() else f'Unnamed: {index}'
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+def _coerce_scores(df):
+    """评分列转换为数值（csv 按文本读取，无法解析的评分视为缺失）"""
+    _, score_col = find_columns(df)
+    if score_col is not None:
+        df[score_col] = pd.to_numeric(df[score_col], errors='coerce')
+    return df
+
+def _detect_encoding(data):
+    """按样本字节判断 csv 编码（兼容 Excel 另存的 GBK 文件）"""
+    sample = data[:CSV_SAMPLE_BYTES]
+    for encoding in CSV_ENCODINGS:
+        try:
+            # 样本可能截断在多字节字符中间，用增量解码器忽略末尾不完整的字符
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return CSV_ENCODINGS[-1]
+
+def _sample_rows(data, encoding):
+    """解析样本中的前若干行，返回 [(行, 该行结束处的字节偏移)]
+
+    引号内含换行的单元格算作一行，偏移按实际读到的物理行累计，
+    正文从表头行结束处的字节开始交给 pyarrow，不依赖物理行号与逻辑行号一致。
+    （utf-8 与 gb18030 的多字节字符中都不含换行字节，按字节切行不会切断字符）
+    """
+    position = 0
+
+    def lines():
+        nonlocal position
+        for line in data[:CSV_SAMPLE_BYTES].splitlines(keepends=True):
+            position += len(line)
+            yield line.decode(encoding, errors='replace')
+
+    rows = []
+    for row in csv.reader(lines()):
+        rows.append((row, position))
+        if len(rows) >= HEADER_SCAN_ROWS:
+            break
+    return rows
+
+def read_excel(data):
+    """读取 xlsx：先读前几行定位表头，再按表头行读取全表"""
+    sample = pd.read_excel(io.BytesIO(data), header=None, nrows=HEADER_SCAN_ROWS)
+    header_row = detect_header_row(sample.itertuples(index=False))
+    return pd.read_excel(io.BytesIO(data), header=DEFAULT_HEADER_ROW if header_row is None else header_row)
+
+def read_csv(data):
+    """读取 csv：样本行定位表头，正文交给 pyarrow 按块流式解析"""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    encoding = _detect_encoding(data)
+    sample = _sample_rows(data, encoding)
+    header_row = detect_header_row(row for row, _ in sample)
+    if header_row is None:
+        header_row = DEFAULT_HEADER_ROW
+    if header_row >= len(sample):
+        return pd.DataFrame()
+    header, body_offset = sample[header_row]
+    names = _column_names(header)
+
+    # 正文从表头行之后的字节开始读取（BOM 已在表头之前，按 utf8 解码即可）
+    reader = pa_csv.open_csv(
+        io.BytesIO(data[body_offset:]),
+        read_options=pa_csv.ReadOptions(
+            column_names=names,
+            block_size=CSV_BLOCK_SIZE,
+            encoding='utf8' if encoding == 'utf-8-sig' else encoding,
+        ),
+        # 所有列按文本读取，避免分块类型推断在后续块中遇到不同类型时报错
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in names},
+            strings_can_be_null=True,
+        ),
+        parse_options=pa_csv.ParseOptions(
+            newlines_in_values=True,
+            invalid_row_handler=lambda row: 'skip',
+        ),
+    )
+    table = pa.Table.from_batches(list(reader), schema=reader.schema)
+    return _coerce_scores(table.to_pandas())
+
+def read_parquet(data):
+    """读取 parquet：按批次读取；列名中没有评分列时在前几行中查找表头"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(io.BytesIO(data))
+    table = pa.Table.from_batches(
+        list(parquet_file.iter_batches(batch_size=PARQUET_BATCH_ROWS)),
+        schema=parquet_file.schema_arrow,
+    )
+    df = table.to_pandas()
+    if find_columns(df)[1] is not None:
+        return df
+
+    header_row = detect_header_row(df.head(HEADER_SCAN_ROWS).itertuples(index=False))
+    if header_row is None:
+        return df
+    body = df.iloc[header_row + 1:].reset_index(drop=True)
+    body.columns = _column_names(df.iloc[header_row])
+    return _coerce_scores(body)
+
+READERS = {
+    '.xlsx': read_excel,
+    '.csv': read_csv,
+    '.parquet': read_parquet,
+}
+
+def read_table(data, name):
+    """按文件扩展名读取上传的文件，返回原始列的 DataFrame"""
+    suffix = Path(name).suffix.lower()
+    if suffix not in READERS:
+        raise ValueError(f"不支持的文件类型: {suffix or name}")
+    return READERS[suffix](data)
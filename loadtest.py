@@ -0,0 +1,235 @@
+# 多会话压测：用 Streamlit 测试 API 无界面驱动若干模拟会话，统计重跑延迟与进程内存
+#
+# 用法：python loadtest.py --levels 1,5,10,20 --rows 2000 --actions 8
+#
+# 所有会话运行在同一进程内（与服务端部署方式一致，共享缓存与分词器），
+# 每个并发档位结束后输出 p50/p95/p99 重跑延迟与进程峰值内存。
+
+# 标准库导入
+import io
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+import resource
+import threading
+import contextlib
+from unittest.mock import MagicMock
+from pathlib import Path
+
+# 第三方库导入
+import numpy as np
+import pandas as pd
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.testing.v1 import AppTest, app_test
+from streamlit.testing.v1.util import patch_config_options
+
+# 本地模块导入
+from cache import cache_manager
+
+APP_PATH = Path(__file__).parent / 'app.py'
+
+# AppTest 不支持文件上传控件：驱动脚本先把 st.file_uploader 替换为读取会话内预置的文件
+DRIVER_SCRIPT = f"""
+import runpy
+import streamlit as st
+st.file_uploader = lambda *args, **kwargs: st.session_state.get('_loadtest_files')
+runpy.run_path({str(APP_PATH)!r}, run_name='__main__')
+"""
+
+# 合成评论的素材
+COMMENT_PHRASES = [
+    '导游态度很好', '导游态度差', '酒店不差', '行程安排非常满意', '建议增加自由活动时间',
+    '希望改进餐饮', '房间很脏', '服务太敷衍了', '风景非常漂亮', '退款太慢', '不是很满意',
+    '性价比高', '大巴车很挤', '讲解很专业', '购物点太多了', '早餐种类丰富', '集合时间总是拖延',
+]
+FILTER_KEYWORDS = ['', '导游', '酒店', '行程', '服务', '餐饮', '太']
+COMMENT_TYPES = [['全部评论'], ['建议评论'], ['负面评论'], ['建议评论', '负面评论']]
+STOP_WORD_CANDIDATES = ['导游', '酒店', '服务', '行程', '时间', '非常']
+
+class SyntheticUpload(io.BytesIO):
+    """模拟 st.file_uploader 返回的上传文件"""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+        self.file_id = name
+        self.size = len(data)
+        self.type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def make_workbook(n_rows, seed, route='线路A', header_row=5):
+    """生成与导出报表格式一致的工作簿（前 header_row 行为报表说明）"""
+    rnd = random.Random(seed)
+    df = pd.DataFrame({
+        '评论内容': ['，'.join(rnd.sample(COMMENT_PHRASES, rnd.randint(1, 3))) for _ in range(n_rows)],
+        '路线名称': [f'{route}-{rnd.randint(1, 3)}' for _ in range(n_rows)],
+        '总安排打分': [rnd.randint(1, 5) for _ in range(n_rows)],
+    })
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=False, startrow=header_row)
+        writer.sheets['Sheet1'].write(0, 0, '评论导出报表')
+    return buffer.getvalue()
+
+def install_shared_runtime(stack):
+    """让并发的 AppTest 共享一个常驻的模拟 Runtime
+
+    AppTest 每次运行都会替换全局 Runtime 单例并在结束时清空，同时临时替换
+    config.get_option；多个会话并发运行时会互相清掉对方的 Runtime 和配置。
+    这里在整个压测期间只安装一次，并让 AppTest 内部的替换变为空操作。
+    """
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage('/mock/media'))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    stack.callback(setattr, Runtime, '_instance', None)
+
+    stack.enter_context(patch_config_options({'global.appTest': True}))
+    originals = (app_test.Runtime, app_test.patch_config_options)
+    app_test.Runtime = type('RuntimeSlot', (), {'_instance': None})
+    app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+    stack.callback(lambda: (setattr(app_test, 'Runtime', originals[0]),
+                            setattr(app_test, 'patch_config_options', originals[1])))
+
+def timed_run(app, element=None, latencies=None):
+    """执行一次重跑并记录耗时（element 为已设置新值的控件）"""
+    started = time.perf_counter()
+    (element or app).run()
+    elapsed = time.perf_counter() - started
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+    if latencies is not None:
+        latencies.append(elapsed)
+    return elapsed
+
+def run_session(session_id, script_path, uploads, n_actions, timeout, latencies, errors):
+    """模拟一个用户：上传并选择文件，然后随机输入筛选词、切换视图、编辑停用词"""
+    rnd = random.Random(session_id)
+    app = AppTest.from_file(script_path, default_timeout=timeout)
+    app.session_state['_loadtest_files'] = uploads
+    try:
+        timed_run(app, latencies=latencies)
+        timed_run(app, app.multiselect[0].set_value(uploads), latencies)
+
+        for _ in range(n_actions):
+            action = rnd.choice(['filter', 'comment_type', 'view', 'stop_word'])
+            if action == 'filter':
+                timed_run(app, app.text_input[0].set_value(rnd.choice(FILTER_KEYWORDS)), latencies)
+            elif action == 'comment_type':
+                widget = next(w for w in app.multiselect if w.label == '评论类型')
+                timed_run(app, widget.set_value(rnd.choice(COMMENT_TYPES)), latencies)
+            elif action == 'view':
+                # 所有标签页每次都会渲染，切换标签页本身不触发重跑；
+                # 这里改为操作标签页内的控件（关键词下拉框、主题数量滑块）
+                selectboxes = [w for w in app.selectbox if w.options]
+                if selectboxes and rnd.random() < 0.7:
+                    widget = rnd.choice(selectboxes)
+                    timed_run(app, widget.set_value(rnd.choice(widget.options)), latencies)
+                else:
+                    timed_run(app, app.slider(key='topic_count').set_value(rnd.randint(2, 15)), latencies)
+            else:
+                app.text_area(key='stop_word_input').set_value(rnd.choice(STOP_WORD_CANDIDATES))
+                timed_run(app, app.button(key='add_stop_word').click(), latencies)
+    except Exception as e:
+        errors.append(f'会话 {session_id}: {type(e).__name__}: {e}')
+
+def current_rss_mb():
+    """当前进程常驻内存（Linux 读 /proc，其他平台返回 None）"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+    except OSError:
+        return None
+
+def peak_rss_mb():
+    """进程启动以来的峰值常驻内存（macOS 以字节为单位，Linux 以 KB 为单位）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+def run_level(concurrency, script_path, args):
+    """以指定并发数同时启动会话，返回该档位的延迟统计"""
+    latencies, errors = [], []
+    threads = []
+    for i in range(concurrency):
+        # 部分会话上传相同文件（团队成员分析同一批导出），其余上传各自的文件
+        seed = i % args.distinct_files
+        uploads = [
+            SyntheticUpload(make_workbook(args.rows, seed * 10 + j, route=f'线路{j + 1}'), f'评论_{seed}_{j}.xlsx')
+            for j in range(args.files)
+        ]
+        threads.append(threading.Thread(
+            target=run_session,
+            args=(i, script_path, uploads, args.actions, args.timeout, latencies, errors),
+            name=f'loadtest-session-{i}'
+        ))
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    values = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) if len(values) else (np.nan,) * 3
+    return {
+        'concurrency': concurrency,
+        'reruns': len(values),
+        'p50_ms': p50,
+        'p95_ms': p95,
+        'p99_ms': p99,
+        'max_ms': values.max() if len(values) else np.nan,
+        'wall_s': wall,
+        'rss_mb': current_rss_mb(),
+        'peak_rss_mb': peak_rss_mb(),
+        'cache_mb': cache_manager.stats()['used_bytes'] / 2**20,
+        'errors': errors,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='评论分析工具多会话压测')
+    parser.add_argument('--levels', default='1,5,10,20', help='依次测试的并发会话数，逗号分隔')
+    parser.add_argument('--rows', type=int, default=2000, help='每个合成工作簿的评论条数')
+    parser.add_argument('--files', type=int, default=2, help='每个会话上传的文件数')
+    parser.add_argument('--distinct-files', type=int, default=5, help='不同文件组的数量（会话按编号轮流使用）')
+    parser.add_argument('--actions', type=int, default=8, help='每个会话在选择文件后执行的交互次数')
+    parser.add_argument('--timeout', type=float, default=300, help='单次重跑的超时时间（秒）')
+    parser.add_argument('--cold', action='store_true', help='每个档位开始前清空共享缓存')
+    return parser.parse_args(argv)
+
+def print_result(result):
+    """输出一个并发档位的统计行"""
+    rss = f"{result['rss_mb']:.0f}" if result['rss_mb'] is not None else '-'
+    print(f"{result['concurrency']:>4} {result['reruns']:>6} {result['p50_ms']:>9.0f} "
+          f"{result['p95_ms']:>9.0f} {result['p99_ms']:>9.0f} {result['max_ms']:>9.0f} "
+          f"{result['wall_s']:>9.1f} {rss:>8} {result['peak_rss_mb']:>8.0f} {result['cache_mb']:>8.0f}",
+          flush=True)
+    for error in result['errors']:
+        print(f'  错误 {error}')
+
+def main(argv=None):
+    args = parse_args(argv)
+    # 屏蔽应用与 Streamlit 的常规日志，只保留统计输出和错误
+    logging.disable(logging.WARNING)
+    levels = [int(level) for level in args.levels.split(',') if level.strip()]
+
+    print(f"{'并发':>4} {'重跑':>6} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} {'最大(ms)':>9} "
+          f"{'总耗时(s)':>9} {'RSS(MB)':>8} {'峰值(MB)':>8} {'缓存(MB)':>8}")
+    with contextlib.ExitStack() as stack:
+        install_shared_runtime(stack)
+        # 驱动脚本只写一次：AppTest.from_string 按内容哈希命名临时文件，并发写入会读到空脚本
+        script_path = Path(stack.enter_context(tempfile.TemporaryDirectory())) / 'loadtest_driver.py'
+        script_path.write_text(DRIVER_SCRIPT, encoding='utf-8')
+        for concurrency in levels:
+            if args.cold:
+                cache_manager.clear()
+            print_result(run_level(concurrency, str(script_path), args))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# 高频短语提取：Space-Saving 草图，在固定内存内找出高频二元/三元短语
+
+# 标准库导入
+from heapq import heappush, heappop
+
+# 每种短语长度最多跟踪的候选数量（内存上限，与语料规模无关）
+PHRASE_CAPACITY = 2000
+PHRASE_SIZES = (2, 3)
+
+class SpaceSaving:
+    """Space-Saving 频繁项草图
+
+    最多保存 capacity 个计数器；新项挤掉当前最小计数器并继承其计数，
+    因此 count - error 是真实频次的下界，count 是上界。
+    """
+
+    def __init__(self, capacity=PHRASE_CAPACITY):
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        # 每个被跟踪项在堆里恰有一个条目；计数增长后条目过期，弹出时再修正
+        self._heap = []
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, item, count=1):
+        """计入一次出现"""
+        self.total += count
+        counts = self.counts
+        if item in counts:
+            counts[item] += count
+            return
+
+        if len(counts) < self.capacity:
+            counts[item] = count
+            self.errors[item] = 0
+            heappush(self._heap, (count, item))
+            return
+
+        min_count, min_item = self._pop_min()
+        del counts[min_item]
+        del self.errors[min_item]
+        counts[item] = min_count + count
+        self.errors[item] = min_count
+        heappush(self._heap, (counts[item], item))
+
+    def _pop_min(self):
+        """弹出真实计数最小的项"""
+        while True:
+            count, item = heappop(self._heap)
+            current = self.counts[item]
+            if current == count:
+                return count, item
+            heappush(self._heap, (current, item))
+
+    def top(self, n=20):
+        """按计数降序返回 [(项, 计数, 误差上界), ...]"""
+        ranked = sorted(self.counts.items(), key=lambda x: x[1], reverse=True)[:n]
+        return [(item, count, self.errors[item]) for item, count in ranked]
+
+def new_phrase_sketches(capacity=PHRASE_CAPACITY):
+    """为每种短语长度创建一个草图"""
+    return {size: SpaceSaving(capacity) for size in PHRASE_SIZES}
+
+def add_phrases(sketches, words, count=1):
+    """把一个分句内的有效词序列切成 n 元短语，按该分句出现的次数计入草图"""
+    for size, sketch in sketches.items():
+        for start in range(len(words) - size + 1):
+            sketch.add(' '.join(words[start:start + size]), count)
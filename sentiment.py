@@ -0,0 +1,116 @@
+# 词典情感打分：在分词结果上批量计算，处理否定词与程度副词
+
+# 标准库导入
+from itertools import chain
+
+# 第三方库导入
+import numpy as np
+import pandas as pd
+
+# 本地模块导入
+from analysis import NEGATIVE_WORDS, CLAUSE_BREAKS
+
+# 正面情绪词汇
+POSITIVE_WORDS = {
+    '好', '满意', '不错', '棒', '赞', '专业', '热情', '耐心', '细心', '贴心',
+    '周到', '负责', '认真', '友好', '干净', '整洁', '舒适', '舒服', '方便', '漂亮',
+    '美', '好吃', '丰富', '值得', '推荐', '喜欢', '开心', '愉快', '惊喜', '完美',
+    '划算', '实惠', '准时', '温馨', '优秀', '到位', '省心', '难忘', '好玩', '感谢',
+}
+
+# 否定词：翻转其后窗口内情感词的极性
+NEGATION_WORDS = {
+    '不', '没', '没有', '无', '未', '非', '别', '不是', '不太', '不算',
+    '并不', '并没有', '从不', '从没', '毫无', '不会', '不够', '一点也不',
+}
+
+# 程度副词及其权重
+INTENSIFIER_WORDS = {
+    '极其': 2.0, '最': 2.0, '非常': 1.8, '特别': 1.8, '十分': 1.8, '超级': 1.8,
+    '太': 1.8, '超': 1.5, '很': 1.5, '相当': 1.5, '真': 1.3, '挺': 1.3,
+    '更': 1.3, '比较': 1.2, '较': 1.2, '有点': 0.7, '有些': 0.7, '稍微': 0.6,
+    '略': 0.6,
+}
+
+# 否定后的极性系数（"不差"弱于"好"），以及否定/程度词的作用窗口
+NEGATION_WEIGHT = -0.5
+MODIFIER_WINDOW = 3
+
+# 可拆分的单字前缀，用于处理 jieba 合并出的 "不差"、"太慢" 等词
+NEGATION_PREFIXES = ('不', '没', '无', '未', '非')
+INTENSIFIER_PREFIXES = {'太': 1.8, '很': 1.5, '超': 1.5, '好': 1.3, '最': 2.0}
+
+SENTIMENT_LABELS = ('负面', '中性', '正面')
+
+def _base_polarity(word):
+    """词典中的原始极性"""
+    if word in NEGATIVE_WORDS:
+        return -1.0
+    if word in POSITIVE_WORDS:
+        return 1.0
+    return 0.0
+
+def _word_polarity(word):
+    """单个词的极性，词典未收录时尝试拆分否定/程度前缀"""
+    polarity = _base_polarity(word)
+    if polarity or len(word) < 2:
+        return polarity
+    head, rest = word[0], word[1:]
+    rest_polarity = _base_polarity(rest)
+    if not rest_polarity:
+        return 0.0
+    if head in NEGATION_PREFIXES:
+        return rest_polarity * NEGATION_WEIGHT
+    if head in INTENSIFIER_PREFIXES:
+        return rest_polarity * INTENSIFIER_PREFIXES[head]
+    return 0.0
+
+def _vocab_tables(vocab):
+    """为去重后的词表计算极性、否定标记、程度权重和分句标记"""
+    polarity = np.fromiter((_word_polarity(w) for w in vocab), dtype=np.float32, count=len(vocab))
+    is_negation = np.fromiter((w in NEGATION_WORDS for w in vocab), dtype=bool, count=len(vocab))
+    intensity = np.fromiter((INTENSIFIER_WORDS.get(w, 1.0) for w in vocab), dtype=np.float32, count=len(vocab))
+    is_break = np.fromiter((w in CLAUSE_BREAKS for w in vocab), dtype=bool, count=len(vocab))
+    return polarity, is_negation, intensity, is_break
+
+def token_polarity(token_lists):
+    """返回 (每个词的有效极性, 所属评论下标)，均为按词展开的一维数组"""
+    lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(token_lists))
+    doc_ids = np.repeat(np.arange(len(token_lists)), lengths)
+    if not len(doc_ids):
+        return np.zeros(0, dtype=np.float32), doc_ids
+
+    # 词表只在去重后的词上计算一次，再按编码广播到整条词流
+    codes, vocab = pd.factorize(pd.Series(chain.from_iterable(token_lists), dtype=object), sort=False)
+    polarity, is_negation, intensity, is_break = _vocab_tables(vocab)
+    values = polarity[codes]
+    negation = is_negation[codes]
+    weight = intensity[codes]
+
+    # 分句编号：评论切换或遇到标点即开启新分句
+    doc_start = np.r_[True, doc_ids[1:] != doc_ids[:-1]]
+    clause_ids = np.cumsum(doc_start | is_break[codes])
+
+    # 向前看 MODIFIER_WINDOW 个词，统计同一分句内的否定词个数与程度权重
+    negation_count = np.zeros(len(values), dtype=np.int8)
+    multiplier = np.ones(len(values), dtype=np.float32)
+    for offset in range(1, MODIFIER_WINDOW + 1):
+        if offset >= len(values):
+            break
+        same_clause = clause_ids[offset:] == clause_ids[:-offset]
+        negation_count[offset:] += negation[:-offset] & same_clause
+        multiplier[offset:] *= np.where(same_clause, weight[:-offset], 1.0)
+
+    flipped = (negation_count % 2 == 1)
+    effective = values * multiplier * np.where(flipped, NEGATION_WEIGHT, 1.0)
+    return effective.astype(np.float32), doc_ids
+
+def score_comments(token_lists):
+    """按评论汇总有效极性，返回每条评论的情感得分"""
+    effective, doc_ids = token_polarity(token_lists)
+    return np.bincount(doc_ids, weights=effective, minlength=len(token_lists)).astype(np.float32)
+
+def label_scores(scores):
+    """把情感得分映射为 负面 / 中性 / 正面 标签"""
+    labels = np.array(SENTIMENT_LABELS, dtype=object)
+    return pd.Categorical(labels[np.sign(scores).astype(np.int8) + 1], categories=SENTIMENT_LABELS)
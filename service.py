@@ -0,0 +1,441 @@
+# 本地查询服务：asyncio HTTP/JSON 接口，供其他看板读取关键词与差评统计
+#
+# 用法：python service.py --port 8765 --workers 4 --root /path/to/exports
+#
+#   GET  /health   服务状态与缓存命中情况
+#   GET  /files    已知文件（本进程读取过的文件与评论库的导入记录）
+#   GET  /query    查询参数：path、hash、comment_type、stop_word 可重复，
+#                  另有 keyword、low_score_threshold、top_k
+#   POST /query    JSON 请求体：{"paths": [...], "hashes": [...], "keyword": "",
+#                  "comment_types": ["全部评论"], "stop_words": [], "low_score_threshold": 3, "top_k": 20}
+#
+# 事件循环只负责收发请求，读文件、分词与统计都在线程池中运行，分词再慢也不会阻塞其他请求；
+# 线程共享进程内缓存，同一文件只解析、分词一次，同一筛选条件的结果只计算一次。
+
+# 标准库导入
+import re
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import argparse
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+# 第三方库导入
+import numpy as np
+import pandas as pd
+
+# 本地模块导入
+from analysis import (
+    LOW_SCORE_THRESHOLD, COMMENT_TYPES,
+    find_columns, filter_mask, stop_words_version, tokenize_comments, build_aggregates, warm_up_tokenizer,
+)
+from sentiment import score_comments
+from vectors import build_term_matrix, group_top_terms
+from cache import cache_manager, memoize
+from ingest import SUPPORTED_TYPES, read_table
+from archive import ARCHIVE_PATH, archive_exists, ingested_file_path, list_ingested_files
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 4
+REQUEST_TIMEOUT = 30
+MAX_BODY_BYTES = 1 << 20
+MAX_TOP_K = 500
+HASH_CHUNK_BYTES = 1 << 20
+
+# 返回的词频视角与聚合结果中的键
+VIEW_KEYS = {
+    'overall': 'word_freq',
+    'low_score': 'word_freq_low',
+    'suggestion': 'suggestion_freq',
+    'negative': 'negative_freq',
+}
+
+STATUS_TEXT = {
+    200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+    405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error',
+}
+
+# 本进程读取过的文件：内容哈希 -> 路径；路径 -> ((大小, 修改时间), 内容哈希)
+_known_files = {}
+_signatures = {}
+_files_lock = threading.Lock()
+
+def file_hash(path):
+    """文件内容哈希；大小与修改时间未变时直接返回上次的结果"""
+    stat = path.stat()
+    signature = (stat.st_size, stat.st_mtime_ns)
+    with _files_lock:
+        cached = _signatures.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    content_hash = digest.hexdigest()
+    with _files_lock:
+        _signatures[path] = (signature, content_hash)
+        _known_files[content_hash] = path
+    return content_hash
+
+def resolve_path(raw_path, root):
+    """校验请求中的文件路径：必须存在、类型受支持，指定了 root 时必须位于其下"""
+    path = Path(raw_path).expanduser().resolve()
+    if root is not None and not path.is_relative_to(root):
+        raise PermissionError(f"路径不在允许的目录下: {raw_path}")
+    if not path.is_file():
+        raise FileNotFoundError(f"文件不存在: {raw_path}")
+    if path.suffix.lower().lstrip('.') not in SUPPORTED_TYPES:
+        raise ValueError(f"不支持的文件类型: {path.suffix or raw_path}")
+    return path
+
+def resolve_files(paths, hashes, root=None, archive_path=ARCHIVE_PATH):
+    """把请求中的路径与内容哈希解析为 [(内容哈希, 路径)]
+
+    内容哈希先在本进程读取过的文件中查找，再查评论库的导入记录（watcher.py 导入的文件）；
+    文件在导入后被改写、内容与哈希不再一致时视为找不到。
+    """
+    files = [(file_hash(path), path) for path in (resolve_path(raw, root) for raw in paths)]
+    for content_hash in hashes:
+        with _files_lock:
+            path = _known_files.get(content_hash)
+        if path is None and archive_exists(archive_path):
+            recorded = ingested_file_path(content_hash, archive_path)
+            path = Path(recorded) if recorded else None
+        if path is None or not path.is_file() or file_hash(path) != content_hash:
+            raise FileNotFoundError(f"未知的文件哈希或文件内容已变化: {content_hash}")
+        if root is not None and not path.resolve().is_relative_to(root):
+            raise PermissionError(f"路径不在允许的目录下: {path}")
+        files.append((content_hash, path))
+    if not files:
+        raise ValueError("请至少指定一个文件路径（paths）或内容哈希（hashes）")
+    return files
+
+@memoize('service_frames')
+def load_frame(content_hash, name, _path):
+    """按文件内容哈希缓存解析后的表格"""
+    df = read_table(Path(_path).read_bytes(), name)
+    df['数据来源'] = name
+    return df
+
+@memoize('service_tokens')
+def get_file_tokens(content_hash, name, _comments):
+    """按文件内容哈希缓存分词结果"""
+    return tokenize_comments(_comments)
+
+@memoize('service_sentiment')
+def get_file_sentiment(content_hash, name, _token_lists):
+    """按文件内容哈希缓存情感得分"""
+    return score_comments(_token_lists)
+
+@memoize('service_term_matrix')
+def get_term_matrix(file_keys, stop_words_version, _token_lists, _stop_words):
+    """按文件组合与停用词版本缓存文档-词矩阵"""
+    return build_term_matrix(_token_lists, _stop_words)
+
+def _breakdown(labels, scores, negative, matrix, vocab, low_score_threshold, top_k):
+    """按分组（来源、路线）统计评论数、差评数、平均分与高频词"""
+    frame = pd.DataFrame({'group': labels.to_numpy(), 'score': scores.to_numpy(), 'negative': negative})
+    grouped = frame.groupby('group', sort=True)
+    stats = pd.DataFrame({
+        'comments': grouped.size(),
+        'low_score': grouped['score'].apply(lambda s: int((s <= low_score_threshold).sum())),
+        'negative': grouped['negative'].sum(),
+        'average_score': grouped['score'].mean(),
+    })
+    top_words = group_top_terms(matrix, vocab, labels.to_numpy(), top_k)
+    return [
+        {
+            'name': str(group),
+            'comments': int(row.comments),
+            'low_score': int(row.low_score),
+            'low_score_rate': round(row.low_score / row.comments, 4) if row.comments else None,
+            'negative': int(row.negative),
+            'average_score': round(float(row.average_score), 3) if pd.notna(row.average_score) else None,
+            'top_words': top_words.get(group, []),
+        }
+        for group, row in stats.iterrows()
+    ]
+
+@memoize('service_results')
+def query_results(file_keys, keyword, comment_types, stop_words_version, low_score_threshold, top_k,
+                  _files, _stop_words):
+    """按文件组合与完整筛选条件缓存一次查询的结果（只读共享，调用方不得修改）"""
+    frames, token_lists, sentiment = [], [], []
+    for content_hash, path in _files:
+        df = load_frame(content_hash, path.name, str(path))
+        tokens = get_file_tokens(content_hash, path.name, df.iloc[:, 0])
+        frames.append(df)
+        token_lists.extend(tokens)
+        sentiment.append(get_file_sentiment(content_hash, path.name, tokens))
+    df = pd.concat(frames, ignore_index=True)
+    sentiment = np.concatenate(sentiment)
+    route_col, score_col = find_columns(df)
+    if score_col is None:
+        raise ValueError('文件中未找到"总安排打分"列')
+
+    matrix, vocab = get_term_matrix(file_keys, stop_words_version, token_lists, _stop_words)
+    positions = np.flatnonzero(filter_mask(df.iloc[:, 0], sentiment, keyword, comment_types).to_numpy())
+    filtered = df.iloc[positions]
+    scores = pd.to_numeric(filtered[score_col], errors='coerce')
+    negative = sentiment[positions] < 0
+    filtered_matrix = matrix[positions]
+    aggregates = build_aggregates(
+        filtered.iloc[:, 0], filtered['数据来源'], scores,
+        [token_lists[i] for i in positions], _stop_words, low_score_threshold
+    )
+
+    average = scores.mean()
+    return {
+        'files': [
+            {'hash': content_hash, 'name': path.name, 'rows': len(frame)}
+            for (content_hash, path), frame in zip(_files, frames)
+        ],
+        'total': len(filtered),
+        'low_score': int((scores <= low_score_threshold).sum()),
+        'negative': int(negative.sum()),
+        'average_score': round(float(average), 3) if pd.notna(average) else None,
+        'top_words': {view: aggregates[key].most_common(top_k) for view, key in VIEW_KEYS.items()},
+        'by_source': _breakdown(filtered['数据来源'], scores, negative, filtered_matrix, vocab,
+                                low_score_threshold, top_k),
+        'by_route': _breakdown(filtered[route_col], scores, negative, filtered_matrix, vocab,
+                               low_score_threshold, top_k) if route_col is not None else [],
+    }
+
+def _int_param(value, name, low, high):
+    """解析整数参数并检查范围"""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} 必须是整数")
+    if not low <= value <= high:
+        raise ValueError(f"{name} 必须在 {low} 到 {high} 之间")
+    return value
+
+def _str_list(value, name):
+    """解析字符串列表参数（单个字符串视为只有一项的列表）"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{name} 必须是字符串列表")
+    return value
+
+def parse_query(params):
+    """校验并规范化查询参数"""
+    if not isinstance(params, dict):
+        raise ValueError("请求体必须是 JSON 对象")
+    comment_types = _str_list(params.get('comment_types'), 'comment_types') or ['全部评论']
+    unknown = [item for item in comment_types if item not in COMMENT_TYPES]
+    if unknown:
+        raise ValueError(f"未知的评论类型: {', '.join(unknown)}（可选 {', '.join(COMMENT_TYPES)}）")
+    keyword = params.get('keyword') or ''
+    if not isinstance(keyword, str):
+        raise ValueError("keyword 必须是字符串")
+    # 关键词与页面筛选一致按正则匹配，无效的正则在此返回 400，而不是在计算中报错
+    try:
+        re.compile(keyword.strip())
+    except re.error as e:
+        raise ValueError(f"keyword 不是有效的正则表达式: {e}")
+    return {
+        'paths': _str_list(params.get('paths'), 'paths'),
+        'hashes': _str_list(params.get('hashes'), 'hashes'),
+        'keyword': keyword.strip(),
+        'comment_types': tuple(comment_types),
+        'stop_words': frozenset(word.strip() for word in _str_list(params.get('stop_words'), 'stop_words') if word.strip()),
+        'low_score_threshold': _int_param(params.get('low_score_threshold', LOW_SCORE_THRESHOLD), 'low_score_threshold', 1, 4),
+        'top_k': _int_param(params.get('top_k', 20), 'top_k', 1, MAX_TOP_K),
+    }
+
+def _params_from_query_string(query_string):
+    """把 GET 查询串转换为与 POST 请求体相同的参数"""
+    values = parse_qs(query_string, keep_blank_values=False)
+    params = {
+        'paths': values.get('path', []),
+        'hashes': values.get('hash', []),
+        'comment_types': values.get('comment_type', []),
+        'stop_words': values.get('stop_word', []),
+    }
+    for name in ('keyword', 'low_score_threshold', 'top_k'):
+        if name in values:
+            params[name] = values[name][-1]
+    return params
+
+def run_query(params, root=None, archive_path=ARCHIVE_PATH):
+    """在工作线程中执行一次查询"""
+    query = parse_query(params)
+    files = resolve_files(query['paths'], query['hashes'], root, archive_path)
+    started = time.perf_counter()
+    # 结果中的数据来源、文件列表按文件名给出，文件名与内容哈希一起作为缓存键
+    result = query_results(
+        tuple((content_hash, path.name) for content_hash, path in files),
+        query['keyword'],
+        query['comment_types'],
+        stop_words_version(query['stop_words']),
+        query['low_score_threshold'],
+        query['top_k'],
+        files,
+        query['stop_words'],
+    )
+    # 结果在请求之间共享，附加字段放在新字典里
+    return {**result, 'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)}
+
+def known_files(archive_path=ARCHIVE_PATH):
+    """本进程读取过的文件与评论库的导入记录"""
+    with _files_lock:
+        loaded = [{'hash': content_hash, 'path': str(path)} for content_hash, path in _known_files.items()]
+    return {
+        'loaded': loaded,
+        'ingested': list_ingested_files(archive_path) if archive_exists(archive_path) else [],
+    }
+
+def health(state):
+    """服务状态与缓存统计"""
+    stats = cache_manager.stats()
+    stats['namespaces'] = {name: {'entries': count, 'bytes': size} for name, (count, size) in stats['namespaces'].items()}
+    return {
+        'status': 'ok',
+        'uptime_s': round(time.monotonic() - state['started_at'], 1),
+        'workers': state['workers'],
+        'cache': stats,
+    }
+
+def _json_default(value):
+    """numpy 标量等非标准类型的 JSON 序列化"""
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
+
+def _response(status, payload):
+    """构造 HTTP 响应字节"""
+    body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode('utf-8')
+    headers = (
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    return headers.encode('latin-1') + body
+
+async def _read_request(reader):
+    """读取一个 HTTP 请求，返回 (方法, 目标, 请求体)"""
+    request_line = (await reader.readline()).decode('latin-1').strip()
+    parts = request_line.split()
+    if len(parts) != 3:
+        raise ValueError("无效的请求行")
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length') or 0)
+    if length > MAX_BODY_BYTES:
+        raise OverflowError("请求体过大")
+    body = await reader.readexactly(length) if length else b''
+    return parts[0].upper(), parts[1], body
+
+async def dispatch(method, target, body, state):
+    """按路径分发请求，返回 (状态码, 响应内容)"""
+    url = urlsplit(target)
+    loop = asyncio.get_running_loop()
+    if url.path == '/health' and method == 'GET':
+        return 200, health(state)
+    if url.path == '/files' and method == 'GET':
+        return 200, await loop.run_in_executor(state['executor'], known_files, state['archive_path'])
+    if url.path == '/query' and method in ('GET', 'POST'):
+        if method == 'GET':
+            params = _params_from_query_string(url.query)
+        else:
+            try:
+                params = json.loads(body.decode('utf-8') or '{}')
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                raise ValueError(f"请求体不是有效的 JSON: {str(e)}")
+        return 200, await loop.run_in_executor(
+            state['executor'], run_query, params, state['root'], state['archive_path']
+        )
+    if url.path in ('/health', '/files', '/query'):
+        return 405, {'error': f"不支持的请求方法: {method}"}
+    return 404, {'error': f"未知的路径: {url.path}"}
+
+async def handle_connection(reader, writer, state):
+    """处理一个连接上的单个请求"""
+    try:
+        method, target, body = await asyncio.wait_for(_read_request(reader), REQUEST_TIMEOUT)
+        status, payload = await dispatch(method, target, body, state)
+    except OverflowError as e:
+        status, payload = 413, {'error': str(e)}
+    except PermissionError as e:
+        status, payload = 403, {'error': str(e)}
+    except FileNotFoundError as e:
+        status, payload = 404, {'error': str(e)}
+    except ValueError as e:
+        status, payload = 400, {'error': str(e)}
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+        writer.close()
+        return
+    except Exception as e:
+        logger.exception("处理请求时出错")
+        status, payload = 500, {'error': str(e)}
+    try:
+        writer.write(_response(status, payload))
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=DEFAULT_WORKERS, root=None, archive_path=ARCHIVE_PATH):
+    """启动服务并一直运行"""
+    state = {
+        'executor': ThreadPoolExecutor(max_workers=workers, thread_name_prefix='query-worker'),
+        'workers': workers,
+        'root': Path(root).expanduser().resolve() if root else None,
+        'archive_path': archive_path,
+        'started_at': time.monotonic(),
+    }
+    # 分词器在后台预热，首个查询不必等待加载词典
+    asyncio.get_running_loop().run_in_executor(state['executor'], warm_up_tokenizer)
+    server = await asyncio.start_server(lambda r, w: handle_connection(r, w, state), host, port)
+    logger.info(f"查询服务已启动: http://{host}:{port}（{workers} 个工作线程）")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        state['executor'].shutdown(wait=False)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='评论分析本地 JSON 查询服务')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='监听地址（默认只接受本机连接）')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='监听端口')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='读取文件与分析的工作线程数')
+    parser.add_argument('--root', help='只允许查询该目录下的文件')
+    parser.add_argument('--archive', default=str(ARCHIVE_PATH), help='评论库路径（按内容哈希查找导入过的文件）')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.root, args.archive))
+    except KeyboardInterrupt:
+        logger.info("查询服务已停止")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
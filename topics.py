@@ -0,0 +1,85 @@
+# 主题聚类：在 TF-IDF 稀疏矩阵上做 Mini-Batch K-Means，内存随批次大小而非语料规模增长
+
+# 第三方库导入
+import numpy as np
+import pandas as pd
+
+# 本地模块导入
+from analysis import LOW_SCORE_THRESHOLD
+
+# 聚类只使用文档频次最高的一部分词，控制簇中心的维度
+MAX_TOPIC_TERMS = 5000
+MIN_TERM_DF = 2
+BATCH_SIZE = 4096
+TOP_TERMS_PER_TOPIC = 8
+
+def _select_terms(matrix, max_terms=MAX_TOPIC_TERMS, min_df=MIN_TERM_DF):
+    """按文档频次选出参与聚类的列"""
+    doc_freq = np.diff(matrix.tocsc().indptr)
+    candidates = np.flatnonzero(doc_freq >= min_df)
+    if len(candidates) > max_terms:
+        candidates = candidates[np.argsort(-doc_freq[candidates], kind='stable')[:max_terms]]
+    return np.sort(candidates)
+
+def cluster_topics(matrix, vocab, comments, scores, n_topics=8, random_state=0, low_score_threshold=LOW_SCORE_THRESHOLD):
+    """对评论聚类，返回 (主题汇总表, 每条评论的主题编号)
+
+    主题编号为 -1 表示该评论没有任何参与聚类的词。
+    """
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.feature_extraction.text import TfidfTransformer
+
+    columns = _select_terms(matrix)
+    labels = np.full(matrix.shape[0], -1, dtype=np.int32)
+    empty = pd.DataFrame(columns=['主题', '评论数', '占比', '平均分', '差评率', '关键词', '代表评论'])
+    if not len(columns):
+        return empty, labels
+
+    reduced = matrix[:, columns]
+    has_terms = np.flatnonzero(np.diff(reduced.indptr) > 0)
+    n_topics = min(n_topics, len(has_terms))
+    if n_topics < 2:
+        return empty, labels
+
+    tfidf = TfidfTransformer(sublinear_tf=True).fit_transform(reduced[has_terms]).astype(np.float32)
+    model = MiniBatchKMeans(
+        n_clusters=n_topics,
+        batch_size=BATCH_SIZE,
+        n_init=3,
+        random_state=random_state
+    )
+    assigned = model.fit_predict(tfidf)
+    labels[has_terms] = assigned
+
+    centers = model.cluster_centers_
+    topic_vocab = vocab[columns]
+    comments = np.asarray(comments, dtype=object)
+    scores = pd.to_numeric(pd.Series(scores), errors='coerce').to_numpy(dtype=np.float64)
+
+    rows = []
+    for topic in range(n_topics):
+        members = np.flatnonzero(assigned == topic)
+        if not len(members):
+            continue
+        # 代表评论：与簇中心余弦相似度最高的一条（TF-IDF 已做 L2 归一化）
+        similarity = tfidf[members] @ centers[topic]
+        representative = has_terms[members[int(np.argmax(similarity))]]
+        member_scores = scores[has_terms[members]]
+        top_terms = topic_vocab[np.argsort(-centers[topic])[:TOP_TERMS_PER_TOPIC]]
+        rows.append({
+            '主题': topic,
+            '评论数': len(members),
+            '占比': round(len(members) / len(labels), 4),
+            '平均分': round(float(np.nanmean(member_scores)), 2) if np.isfinite(member_scores).any() else None,
+            '差评率': round(float(np.mean(member_scores <= low_score_threshold)), 4),
+            '关键词': '、'.join(top_terms),
+            '代表评论': comments[representative],
+        })
+
+    summary = pd.DataFrame(rows).sort_values('评论数', ascending=False).reset_index(drop=True)
+    # 按规模重新编号，主题 1 为最大的簇
+    renumber = np.full(n_topics, -1, dtype=np.int32)
+    renumber[summary['主题'].to_numpy()] = np.arange(1, len(summary) + 1)
+    summary['主题'] = renumber[summary['主题'].to_numpy()]
+    labels[has_terms] = renumber[assigned]
+    return summary, labels
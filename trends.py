@@ -0,0 +1,141 @@
+# 时间趋势：按评价日期把评论归入周 / 月，用稀疏的 (周期 × 评论) 指示矩阵一次乘法完成各周期统计
+
+# 第三方库导入
+import numpy as np
+import pandas as pd
+
+# 本地模块导入
+from analysis import LOW_SCORE_THRESHOLD, SUGGESTION_WORDS, NEGATIVE_WORDS
+from vectors import presence_matrix
+
+# 周期粒度：周从周一开始
+TREND_FREQS = {'周': 'W-SUN', '月': 'M'}
+
+# 上升词：最近一个周期与之前若干周期比较，本期至少出现在这么多条评论中才参与排名
+RISING_BASELINE_PERIODS = 4
+RISING_MIN_COUNT = 5
+
+def parse_dates(values):
+    """把日期列解析为 datetime（无法解析的记为 NaT）"""
+    return pd.to_datetime(pd.Series(values), errors='coerce', format='mixed')
+
+def period_indicator(dates, freq):
+    """返回 (周期 × 评论 的稀疏指示矩阵, 各周期起始日期)
+
+    周期覆盖最早到最晚日期之间的每一个周 / 月，没有评论的周期保留为空行；
+    没有日期的评论不属于任何周期。
+    """
+    from scipy import sparse
+
+    periods = pd.Series(dates).dt.to_period(freq)
+    valid = periods.notna().to_numpy()
+    if not valid.any():
+        return sparse.csr_matrix((0, len(periods)), dtype=np.int32), pd.DatetimeIndex([])
+    ordinals = periods[valid].array.asi8
+    first = ordinals.min()
+    codes = ordinals - first
+    n_periods = int(codes.max()) + 1
+    indicator = sparse.csr_matrix(
+        (np.ones(len(codes), dtype=np.int32), (codes, np.flatnonzero(valid))),
+        shape=(n_periods, len(periods))
+    )
+    starts = pd.period_range(start=periods[valid].min(), periods=n_periods, freq=freq).start_time
+    return indicator, starts
+
+def _rate(numerator, denominator):
+    """按周期计算比率，没有评论的周期为 NaN"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+def build_trends(matrix, vocab, dates, scores, sentiment_scores, freq='W-SUN',
+                 low_score_threshold=LOW_SCORE_THRESHOLD):
+    """计算各周期的评论数、差评率、词典命中率以及上升最快的词
+
+    返回字典：periods 为各周期统计表，rising 为上升词表，term_counts 为
+    (周期 × 词) 的稀疏评论数矩阵，starts 为各周期起始日期。
+    """
+    indicator, starts = period_indicator(dates, freq)
+    presence = presence_matrix(matrix)
+    scores = pd.to_numeric(pd.Series(scores), errors='coerce').to_numpy(dtype=np.float64)
+
+    # 词典命中：评论中出现任一建议词 / 负面词（与各分析视角的词表口径一致）
+    suggestion_columns = np.flatnonzero(pd.Series(vocab).isin(SUGGESTION_WORDS).to_numpy())
+    negative_columns = np.flatnonzero(pd.Series(vocab).isin(NEGATIVE_WORDS).to_numpy())
+    flags = np.column_stack([
+        np.ones(len(scores)),
+        scores <= low_score_threshold,
+        np.asarray(presence[:, suggestion_columns].sum(axis=1)).ravel() > 0,
+        np.asarray(presence[:, negative_columns].sum(axis=1)).ravel() > 0,
+        np.asarray(sentiment_scores, dtype=np.float64) < 0,
+    ]).astype(np.float64)
+    counts = indicator @ flags
+    totals = counts[:, 0]
+
+    periods = pd.DataFrame({
+        '周期': starts,
+        '评论数': totals.astype(np.int64),
+        '差评数': counts[:, 1].astype(np.int64),
+        '差评率': _rate(counts[:, 1], totals),
+        '建议词命中率': _rate(counts[:, 2], totals),
+        '负面词命中率': _rate(counts[:, 3], totals),
+        '负面情感率': _rate(counts[:, 4], totals),
+    })
+    term_counts = (indicator @ presence).tocsr()
+    return {
+        'periods': periods,
+        'rising': rising_terms(term_counts, totals, vocab),
+        'term_counts': term_counts,
+        'starts': starts,
+    }
+
+def rising_terms(term_counts, totals, vocab, baseline_periods=RISING_BASELINE_PERIODS,
+                 min_count=RISING_MIN_COUNT, top_n=30):
+    """比较最近一个有评论的周期与之前 baseline_periods 个周期中各词的评论占比
+
+    按两比例 z 检验排序，z 值越大说明本期提及比例的上升越不像随机波动。
+    """
+    columns = ['关键词', '本期评论数', '本期占比', '基期占比', '变化倍数', 'z值']
+    active = np.flatnonzero(totals > 0)
+    if len(active) < 2:
+        return pd.DataFrame(columns=columns)
+    latest = active[-1]
+    start = max(latest - baseline_periods, 0)
+    n_recent = totals[latest]
+    n_base = totals[start:latest].sum()
+    if n_base == 0:
+        return pd.DataFrame(columns=columns)
+
+    recent = term_counts[latest].toarray().ravel().astype(np.float64)
+    base = np.asarray(term_counts[start:latest].sum(axis=0)).ravel().astype(np.float64)
+    keep = np.flatnonzero(recent >= min_count)
+    recent, base = recent[keep], base[keep]
+
+    p_recent = recent / n_recent
+    p_base = base / n_base
+    pooled = (recent + base) / (n_recent + n_base)
+    z_scores = (p_recent - p_base) / np.sqrt(pooled * (1 - pooled) * (1 / n_recent + 1 / n_base) + 1e-12)
+    # 基期未出现的词按半条评论平滑，避免倍数为无穷大
+    ratios = p_recent / np.maximum(p_base, 0.5 / n_base)
+
+    result = pd.DataFrame({
+        '关键词': vocab[keep],
+        '本期评论数': recent.astype(np.int64),
+        '本期占比': np.round(p_recent, 4),
+        '基期占比': np.round(p_base, 4),
+        '变化倍数': np.round(ratios, 2),
+        'z值': np.round(z_scores, 2),
+    }, columns=columns)
+    result = result[result['z值'] > 0]
+    return result.sort_values('z值', ascending=False, kind='stable').head(top_n).reset_index(drop=True)
+
+def term_shares(trends, vocab, words):
+    """返回所选词在各周期的评论占比（行为周期，列为词）"""
+    index = {word: i for i, word in enumerate(vocab)}
+    positions = [index[word] for word in words if word in index]
+    totals = trends['periods']['评论数'].to_numpy(dtype=np.float64)
+    counts = trends['term_counts'][:, positions].toarray()
+    return pd.DataFrame(
+        _rate(counts, totals[:, None]),
+        index=trends['starts'],
+        columns=[vocab[i] for i in positions]
+    )
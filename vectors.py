@@ -0,0 +1,222 @@
+# 稀疏词矩阵：把分词结果转换为文档-词矩阵，供来源对比等向量化分析使用
+
+# 标准库导入
+from itertools import chain
+
+# 第三方库导入
+import numpy as np
+import pandas as pd
+
+# 本地模块导入
+from analysis import LOW_SCORE_THRESHOLD, is_valid_word
+
+# 对数几率的 Dirichlet 先验总量（按全语料词频分配到各词）
+PRIOR_STRENGTH = 500.0
+
+def build_term_matrix(token_lists, user_stop_words=()):
+    """返回 (CSR 文档-词计数矩阵, 词表数组)，只保留参与统计的有效词"""
+    from scipy import sparse
+
+    lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(token_lists))
+    doc_ids = np.repeat(np.arange(len(token_lists), dtype=np.int32), lengths)
+    codes, vocab = pd.factorize(pd.Series(chain.from_iterable(token_lists), dtype=object), sort=False)
+
+    # 有效词判断只在去重后的词表上做一次
+    valid = np.fromiter(
+        (is_valid_word(word, user_stop_words) for word in vocab),
+        dtype=bool, count=len(vocab)
+    )
+    new_codes = np.full(len(vocab), -1, dtype=np.int64)
+    new_codes[valid] = np.arange(valid.sum())
+    codes = new_codes[codes]
+    keep = codes >= 0
+
+    matrix = sparse.csr_matrix(
+        (np.ones(keep.sum(), dtype=np.int32), (doc_ids[keep], codes[keep])),
+        shape=(len(token_lists), int(valid.sum()))
+    )
+    matrix.sum_duplicates()
+    return matrix, np.asarray(vocab, dtype=object)[valid]
+
+def presence_matrix(matrix, dtype=np.float64):
+    """转换为 0/1 矩阵：只看词是否出现，同一评论中重复出现不加权"""
+    from scipy import sparse
+
+    matrix = matrix.tocsr()
+    return sparse.csr_matrix(
+        (np.ones(matrix.nnz, dtype=dtype), matrix.indices, matrix.indptr),
+        shape=matrix.shape
+    )
+
+def group_indicator(labels):
+    """把每条评论的分组标签转换为 (分组 × 评论) 的稀疏指示矩阵"""
+    from scipy import sparse
+
+    codes, groups = pd.factorize(pd.Series(labels), sort=True)
+    valid = codes >= 0
+    indicator = sparse.csr_matrix(
+        (np.ones(valid.sum(), dtype=np.int32), (codes[valid], np.flatnonzero(valid))),
+        shape=(len(groups), len(codes))
+    )
+    return indicator, np.asarray(groups, dtype=object)
+
+def group_top_terms(matrix, vocab, labels, top_k=20):
+    """按分组（来源、路线等）统计词频，返回 {分组: [(词, 出现次数), ...]}"""
+    indicator, groups = group_indicator(labels)
+    counts = (indicator @ matrix).tocsr()
+    result = {}
+    for row, group in enumerate(groups):
+        start, end = counts.indptr[row], counts.indptr[row + 1]
+        data, columns = counts.data[start:end], counts.indices[start:end]
+        order = np.argsort(-data, kind='stable')[:top_k]
+        result[group] = [(vocab[columns[i]], int(data[i])) for i in order]
+    return result
+
+def distinctive_terms(matrix, vocab, labels, top_n=20, prior_strength=PRIOR_STRENGTH):
+    """按来源计算带先验的对数几率 z 值，返回各来源最具区分度的词
+
+    只在各来源实际出现过的 (来源, 词) 非零项上计算，词表再大也保持稀疏。
+    """
+    indicator, groups = group_indicator(labels)
+    counts = (indicator @ matrix).tocoo()
+    term_totals = np.asarray(matrix.sum(axis=0)).ravel().astype(np.float64)
+    group_totals = np.asarray(counts.sum(axis=1)).ravel().astype(np.float64)
+    total = term_totals.sum()
+    if not counts.nnz or total == 0:
+        return pd.DataFrame(columns=['数据来源', '关键词', '出现次数', '来源内占比', '区分度'])
+
+    alpha = prior_strength * term_totals / total
+    rows, cols = counts.row, counts.col
+    y_group = counts.data.astype(np.float64)
+    y_rest = term_totals[cols] - y_group
+    a = alpha[cols]
+    n_group = group_totals[rows]
+    n_rest = total - n_group
+
+    delta = (
+        np.log((y_group + a) / (n_group + prior_strength - y_group - a))
+        - np.log((y_rest + a) / (n_rest + prior_strength - y_rest - a))
+    )
+    z_scores = delta / np.sqrt(1.0 / (y_group + a) + 1.0 / (y_rest + a))
+
+    # 只保留相对其余来源偏高的词，每个来源内按 z 值降序取前 top_n
+    positive = np.flatnonzero(z_scores > 0)
+    order = positive[np.lexsort((-z_scores[positive], rows[positive]))]
+    sorted_rows = rows[order]
+    group_start = np.searchsorted(sorted_rows, sorted_rows, side='left')
+    rank = np.arange(len(order)) - group_start
+    picked = order[rank < top_n]
+
+    return pd.DataFrame({
+        '数据来源': groups[rows[picked]],
+        '关键词': vocab[cols[picked]],
+        '出现次数': y_group[picked].astype(np.int64),
+        '来源内占比': np.round(y_group[picked] / n_group[picked], 4),
+        '区分度': np.round(z_scores[picked], 2),
+    })
+
+# 评分影响：词至少出现在这么多条有评分的评论中才参与排名，95% 置信区间的 z 值
+IMPACT_MIN_COUNT = 20
+CONFIDENCE_Z = 1.96
+
+def score_impact(matrix, vocab, scores, min_count=IMPACT_MIN_COUNT, low_score_threshold=LOW_SCORE_THRESHOLD):
+    """按词统计含该词评论的平均分及置信区间，返回 (按影响值从负到正排序的表, 全体平均分)
+
+    影响值 = (含该词评论的平均分 - 全体平均分) × 含该词评论数，
+    即这些评论相对整体拉低（负值）或拉高（正值）的总分。
+    """
+    columns = ['关键词', '评论数', '平均分', '置信下限', '置信上限', '分差', '影响值', '差评率', '显著']
+    scores = pd.to_numeric(pd.Series(scores), errors='coerce').to_numpy(dtype=np.float64)
+    rated = np.isfinite(scores)
+    if not rated.any():
+        return pd.DataFrame(columns=columns), np.nan
+
+    presence = presence_matrix(matrix[rated])
+    scores = scores[rated]
+    overall_mean = float(scores.mean())
+
+    counts = np.asarray(presence.sum(axis=0)).ravel()
+    keep = np.flatnonzero(counts >= max(min_count, 2))
+    counts = counts[keep]
+    transposed = presence.T.tocsr()[keep]
+    sums = transposed @ scores
+    squares = transposed @ (scores * scores)
+    low = transposed @ (scores <= low_score_threshold).astype(np.float64)
+
+    means = sums / counts
+    variances = np.maximum(squares - counts * means ** 2, 0.0) / (counts - 1)
+    margins = CONFIDENCE_Z * np.sqrt(variances / counts)
+    deltas = means - overall_mean
+
+    result = pd.DataFrame({
+        '关键词': vocab[keep],
+        '评论数': counts.astype(np.int64),
+        '平均分': np.round(means, 3),
+        '置信下限': np.round(means - margins, 3),
+        '置信上限': np.round(means + margins, 3),
+        '分差': np.round(deltas, 3),
+        '影响值': np.round(deltas * counts, 1),
+        '差评率': np.round(low / counts, 4),
+        '显著': np.abs(deltas) > margins,
+    }, columns=columns)
+    return result.sort_values('影响值', kind='stable').reset_index(drop=True), overall_mean
+
+# 共现统计只在文档频次最高的这些词上进行，词-词矩阵的规模与语料条数无关
+COOCCURRENCE_VOCAB = 2000
+COOCCURRENCE_MIN_COUNT = 3
+
+def build_cooccurrence(matrix, vocab, top_n=COOCCURRENCE_VOCAB):
+    """计算高频词之间的共现评论数（稀疏词-词矩阵），返回共现统计字典"""
+    presence = presence_matrix(matrix, dtype=np.int32)
+    doc_freq = np.diff(presence.tocsc().indptr)
+    columns = np.sort(np.argsort(-doc_freq, kind='stable')[:top_n])
+    columns = columns[doc_freq[columns] > 0]
+    top = presence[:, columns]
+    return {
+        'matrix': (top.T @ top).tocsr(),
+        'vocab': vocab[columns],
+        'index': {word: i for i, word in enumerate(vocab[columns])},
+        'doc_freq': doc_freq[columns].astype(np.float64),
+        'n_docs': presence.shape[0],
+    }
+
+def partner_terms(cooccurrence, word, top_k=15, min_count=COOCCURRENCE_MIN_COUNT, order_by='PMI'):
+    """返回与 word 共现最强的词：共现评论数、提升度与 PMI（词不在统计范围内时返回 None）
+
+    提升度 = P(a, b) / (P(a) P(b))，PMI = log2(提升度)，两者排序一致；
+    order_by 也可取 '共现评论数'，偏向高频搭配。
+    """
+    index = cooccurrence['index'].get(word)
+    if index is None:
+        return None
+    row = cooccurrence['matrix'].getrow(index).tocoo()
+    keep = (row.col != index) & (row.data >= min_count)
+    partners, counts = row.col[keep], row.data[keep].astype(np.float64)
+    doc_freq, n_docs = cooccurrence['doc_freq'], cooccurrence['n_docs']
+    lift = counts * n_docs / (doc_freq[index] * doc_freq[partners])
+
+    result = pd.DataFrame({
+        '关联词': cooccurrence['vocab'][partners],
+        '共现评论数': counts.astype(np.int64),
+        '条件概率': np.round(counts / doc_freq[index], 4),
+        '提升度': np.round(lift, 2),
+        'PMI': np.round(np.log2(lift), 3),
+    })
+    return result.sort_values(order_by, ascending=False, kind='stable').head(top_k).reset_index(drop=True)
+
+def partner_edges(cooccurrence, words, min_count=COOCCURRENCE_MIN_COUNT):
+    """返回给定词之间的共现边 (词 a, 词 b, 共现评论数, PMI)，用于绘制网络图"""
+    index = cooccurrence['index']
+    positions = np.array([index[word] for word in words if word in index], dtype=np.int64)
+    block = cooccurrence['matrix'][positions][:, positions].tocoo()
+    upper = (block.row < block.col) & (block.data >= min_count)
+    rows, cols, counts = block.row[upper], block.col[upper], block.data[upper].astype(np.float64)
+    doc_freq = cooccurrence['doc_freq'][positions]
+    pmi = np.log2(counts * cooccurrence['n_docs'] / (doc_freq[rows] * doc_freq[cols]))
+    vocab = cooccurrence['vocab'][positions]
+    return pd.DataFrame({
+        '词a': vocab[rows],
+        '词b': vocab[cols],
+        '共现评论数': counts.astype(np.int64),
+        'PMI': np.round(pmi, 3),
+    })
@@ -0,0 +1,127 @@
+# 目录监控导入：定时扫描导出目录，把新增或内容变化的评论文件增量写入本地评论库
+#
+# 用法：python watcher.py /path/to/exports --interval 60
+#
+# 文件按内容哈希判断是否导入过（改名、重复拷贝不会重复导入）；评论按行内容哈希去重，
+# 只对库中尚不存在的评论分词，并增量更新全文索引与评论库面板使用的词统计。
+# 界面选择「本地评论库」时直接读取入库时保存的分词，无需上传、解析和重新分词；
+# 词频、情感得分与词矩阵仍在打开语料时按当前筛选条件计算（结果进入进程内缓存）。
+
+# 标准库导入
+import sys
+import time
+import hashlib
+import logging
+import argparse
+from pathlib import Path
+
+# 本地模块导入
+from analysis import find_columns, find_date_column
+from ingest import SUPPORTED_TYPES, read_table
+from archive import ARCHIVE_PATH, archive_comments, archive_stats, file_ingested, record_ingested_file
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 60
+# 修改时间距今不足该秒数的文件视为仍在写入，下一轮再处理
+SETTLE_SECONDS = 5
+
+def file_digest(data):
+    """文件内容哈希"""
+    return hashlib.sha1(data).hexdigest()
+
+def candidate_files(directory, recursive=False):
+    """列出目录中支持的评论文件（跳过 Excel 的 ~$ 锁文件和隐藏文件）"""
+    pattern = '**/*' if recursive else '*'
+    return sorted(
+        path for path in Path(directory).glob(pattern)
+        if path.is_file()
+        and path.suffix.lower().lstrip('.') in SUPPORTED_TYPES
+        and not path.name.startswith(('~$', '.'))
+    )
+
+def ingest_file(path, archive_path=ARCHIVE_PATH):
+    """导入单个文件，返回 (总行数, 新增评论数)；内容已导入过时返回 None"""
+    data = path.read_bytes()
+    digest = file_digest(data)
+    if file_ingested(digest, archive_path):
+        return None
+
+    df = read_table(data, path.name)
+    df['数据来源'] = path.name
+    route_col, score_col = find_columns(df)
+    if score_col is None:
+        raise ValueError('未找到"总安排打分"列')
+    added = archive_comments(df, None, route_col, score_col, find_date_column(df), path=archive_path)
+    stat = path.stat()
+    record_ingested_file(digest, path, stat.st_size, stat.st_mtime, len(df), added, archive_path)
+    return len(df), added
+
+def scan_once(directory, seen, archive_path=ARCHIVE_PATH, recursive=False):
+    """扫描一轮，返回本轮新增的评论数
+
+    seen 记录每个文件上次处理时的 (大小, 修改时间)，未变化的文件不再读取计算哈希。
+    """
+    total_added = 0
+    now = time.time()
+    for path in candidate_files(directory, recursive):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        signature = (stat.st_size, stat.st_mtime)
+        if seen.get(path) == signature or now - stat.st_mtime < SETTLE_SECONDS:
+            continue
+        try:
+            started = time.perf_counter()
+            result = ingest_file(path, archive_path)
+        except Exception as e:
+            # 解析失败的文件记下签名，文件内容变化后再重试
+            logger.error(f"导入失败 {path}: {str(e)}")
+            seen[path] = signature
+            continue
+        seen[path] = signature
+        if result is None:
+            logger.info(f"跳过已导入的文件 {path}")
+            continue
+        rows, added = result
+        total_added += added
+        logger.info(f"已导入 {path}：{rows} 行，新增 {added} 条评论，耗时 {time.perf_counter() - started:.1f}s")
+    return total_added
+
+def watch(directory, interval=DEFAULT_INTERVAL, archive_path=ARCHIVE_PATH, recursive=False, once=False):
+    """持续监控目录（once 为 True 时只扫描一轮）"""
+    seen = {}
+    logger.info(f"开始监控 {directory}，评论库 {archive_path}，间隔 {interval}s")
+    while True:
+        added = scan_once(directory, seen, archive_path, recursive)
+        if added:
+            stats = archive_stats(archive_path)
+            logger.info(f"评论库现有 {stats['comments']} 条评论，来自 {stats['sources']} 个文件")
+        if once:
+            return added
+        time.sleep(interval)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='监控导出目录，把评论文件增量导入本地评论库')
+    parser.add_argument('directory', help='要监控的目录')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='扫描间隔（秒）')
+    parser.add_argument('--archive', default=str(ARCHIVE_PATH), help='评论库路径')
+    parser.add_argument('--recursive', action='store_true', help='同时扫描子目录')
+    parser.add_argument('--once', action='store_true', help='只扫描一轮后退出（适合由 cron 调度）')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    if not Path(args.directory).is_dir():
+        logger.error(f"目录不存在: {args.directory}")
+        return 1
+    try:
+        watch(args.directory, args.interval, args.archive, args.recursive, args.once)
+    except KeyboardInterrupt:
+        logger.info("已停止监控")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())